@@ -0,0 +1,262 @@
+"""
+Offline benchmarks of the grid engine (planning, parsing, validation, hashing, ids, resume and rendering overhead).
+
+SD-WebUI is replaced by the stand-in `modules` package from `benchmarks/stubs`, rendering is instant,
+so the numbers only reflect the cost of the extension itself.
+
+    python benchmarks/bench_grid.py                      # compare against benchmarks/baseline.json
+    python benchmarks/bench_grid.py --save-baseline      # record a new baseline
+    python benchmarks/bench_grid.py --sizes 10 1000 --stages plan filenames
+"""
+# Python
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from copy import deepcopy
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path[:0] = [str(BENCH_DIR.joinpath("stubs")), str(BENCH_DIR.parent)]
+
+# pylint: disable=wrong-import-position
+# SD-WebUI (stubs)
+from modules import sd_samplers, sd_vae, shared  # noqa: E402
+from modules.processing import StableDiffusionProcessingTxt2Img  # noqa: E402
+
+# Local
+from sd_advanced_grid.axis_options import axis_options, find_axis_index  # noqa: E402
+from sd_advanced_grid.grid_plan import GridIdentity, file_exist, iter_cell_ids, iter_cell_indexes  # noqa: E402
+from sd_advanced_grid.logs import logger  # noqa: E402
+from sd_advanced_grid.output import generate_filename  # noqa: E402
+from sd_advanced_grid.process_axes import generate_grid, prepare_jobs  # noqa: E402
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from sd_advanced_grid.grid_settings import AxisOption
+
+# ################################# Constants ################################ #
+
+BASELINE_FILE = BENCH_DIR.joinpath("baseline.json")
+DEFAULT_SIZES = [10, 1_000, 100_000, 1_000_000]
+# stages creating a processing instance or a file per cell are capped
+STAGE_LIMITS = {"plan": 100_000, "resume_scan": 5_000, "render": 1_000}
+MIN_TIME = 0.01  # seconds, faster stages are too noisy to be compared
+# the axes resolved in bulk (Sampler, Checkpoint, VAE) come early so they are part of the smaller grids too
+AXIS_KINDS = ["CFG Scale", "Sampler", "Checkpoint", "VAE", "Steps", "Seed", "Replace TAG"]
+
+# ################################ Grid Setup ################################ #
+
+
+def axis_lengths(size: int) -> list[int]:
+    """split a grid size into axis lengths (10 values per axis, the remainder on the last one)"""
+    lengths: list[int] = []
+    remaining = size
+    while remaining > 10 and len(lengths) < len(AXIS_KINDS) - 1 and remaining % 10 == 0:
+        lengths.append(10)
+        remaining //= 10
+    return [*lengths, remaining]
+
+
+def axis_values(kind: str, length: int) -> str:
+    if kind == "CFG Scale":
+        return f"1-30 [{length}]"
+    if kind == "Steps":
+        return f"1-{length}"
+    if kind == "Replace TAG":
+        return "TAG=" + ", ".join(f"subject {index}" for index in range(length))
+    if kind == "Checkpoint":
+        return ", ".join(f"model_{index:03d}" for index in range(length))
+    if kind == "Sampler":
+        return ", ".join(sd_samplers.all_samplers[index % len(sd_samplers.all_samplers)].name for index in range(length))
+    if kind == "VAE":
+        return ", ".join(f"vae_{index % len(sd_vae.vae_dict):02d}.safetensors" for index in range(length))
+    return ", ".join(str(1000 + index) for index in range(length))
+
+
+def grid_selection(size: int):
+    return [(kind, axis_values(kind, length)) for kind, length in zip(AXIS_KINDS, axis_lengths(size))]
+
+
+def create_proc(outpath: str = ""):
+    return StableDiffusionProcessingTxt2Img(
+        prompt="a photo of a TAG", outpath_grids=outpath, seed=1234, subseed=5678, do_not_save_grid=True
+    )
+
+
+def parse_axes(size: int) -> list[AxisOption]:
+    return [deepcopy(axis_options[find_axis_index(kind)]).set(values) for kind, values in grid_selection(size)]
+
+
+def validated_axes(size: int, proc) -> list[AxisOption]:
+    axes = parse_axes(size)
+    for axis in axes:
+        axis.validate_all(proc=proc)
+    return axes
+
+
+def iter_axis_sets(axes: list[AxisOption]):
+    ordered = sorted(axes, key=lambda axis: axis.cost)
+    for values in itertools.product(*[axis.values for axis in reversed(ordered)]):
+        yield {axis.id: (axis.label, value) for axis, value in zip(reversed(ordered), values)}
+
+
+# ################################## Stages ################################## #
+
+
+def stage_parse(size: int):
+    def parse():
+        axes = parse_axes(size)
+        assert math.prod(axis.length for axis in axes) == size, "unexpected grid size"
+
+    return parse
+
+
+def stage_validate(size: int):
+    axes = parse_axes(size)
+    proc = create_proc()
+    return lambda: [axis.validate_all(proc=proc) for axis in axes]
+
+
+def stage_cell_ids(size: int):
+    axes = parse_axes(size)
+    return lambda: sum(1 for _ in iter_cell_ids(axes))
+
+
+def stage_plan(size: int):
+    proc = create_proc()
+    axes = validated_axes(size, proc)
+    return lambda: prepare_jobs(proc, axes, size, "bench")
+
+
+def stage_filenames(size: int):
+    axes = parse_axes(size)
+    proc = create_proc()
+    return lambda: [generate_filename(proc, axis_set) for axis_set in iter_axis_sets(axes)]
+
+
+def stage_identity(size: int):
+    axes = parse_axes(size)
+    identity = GridIdentity(axes)
+    return lambda: [(identity.cell_id(indexes), identity.digest(indexes)) for indexes in iter_cell_indexes(axes)]
+
+
+def stage_resume_scan(size: int):
+    axes = parse_axes(size)
+    folder = Path(tempfile.mkdtemp(prefix="adv_grid_bench_"))
+    cell_ids = list(iter_cell_ids(axes))
+    for cell_id in cell_ids[::2]:  # half of the grid already rendered
+        folder.joinpath(f"adv_cell-{cell_id}-0123456789abcdef.png").touch()
+    return lambda: sum(1 for cell_id in cell_ids if file_exist(folder, cell_id))
+
+
+def stage_render(size: int):
+    proc = create_proc(tempfile.mkdtemp(prefix="adv_grid_bench_"))
+    axes = validated_axes(size, proc)
+    return lambda: generate_grid(proc, f"bench_{size}", False, 1, False, axes)
+
+
+STAGES: dict[str, Callable[[int], Any]] = {
+    "parse": stage_parse,
+    "validate": stage_validate,
+    "cell_ids": stage_cell_ids,
+    "plan": stage_plan,
+    "filenames": stage_filenames,
+    "identity": stage_identity,
+    "resume_scan": stage_resume_scan,
+    "render": stage_render,
+}
+
+# ################################## Runner ################################## #
+
+
+def measure(setup: Callable[[int], Callable[[], Any]], size: int, repeat: int, memory: bool) -> dict[str, float]:
+    """best time out of `repeat` runs, then the peak memory of an extra traced run"""
+    timings = []
+    with open(os.devnull, mode="w", encoding="UTF-8") as devnull, redirect_stdout(devnull):  # mute the logs
+        for _ in range(repeat):
+            run = setup(size)
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        result = {"time": min(timings), "per_cell_us": min(timings) / size * 1e6}
+        if memory:
+            run = setup(size)
+            tracemalloc.start()
+            run()
+            result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+    return result
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for stage, sizes in results.items():
+        for size, current in sizes.items():
+            previous = baseline.get(stage, {}).get(size)
+            if previous is None:
+                continue
+            for metric in ("time", "peak_mb"):
+                if metric == "time" and current[metric] < MIN_TIME:
+                    continue
+                if metric in current and metric in previous and current[metric] > previous[metric] * threshold:
+                    ratio = current[metric] / max(previous[metric], 1e-9)
+                    regressions.append(f"{stage} [{size} cells] {metric}: x{ratio:.2f}")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="grid sizes (cells)")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=1, help="runs per measure, the best time is kept")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory measures")
+    parser.add_argument("--no-limits", action="store_true", help="run capped stages on every size")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="ratio considered as a regression")
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    shared.state.begin("bench")
+    logger.configure("error")
+
+    results: dict[str, dict[str, dict[str, float]]] = {}
+    for stage in args.stages:
+        for size in args.sizes:
+            if not args.no_limits and size > STAGE_LIMITS.get(stage, size):
+                continue
+            result = measure(STAGES[stage], size, args.repeat, not args.no_memory)
+            results.setdefault(stage, {})[str(size)] = result
+            peak = f"{result['peak_mb']:9.1f} MiB" if "peak_mb" in result else ""
+            print(f"{stage:<12} {size:>9} cells {result['time']:10.4f}s {result['per_cell_us']:10.2f} us/cell {peak}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="UTF-8")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n", encoding="UTF-8")
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print("No baseline to compare with, use --save-baseline to create one")
+        return 0
+    regressions = compare(results, json.loads(args.baseline.read_text(encoding="UTF-8")), args.threshold)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
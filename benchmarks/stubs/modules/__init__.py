@@ -0,0 +1,4 @@
+"""
+Minimal stand-in of the SD-WebUI `modules` package,
+only what the extension relies on with a fake (instant) rendering so the grid engine can be benchmarked offline
+"""
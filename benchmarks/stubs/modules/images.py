@@ -0,0 +1,19 @@
+from pathlib import Path
+
+
+class FilenameGenerator:
+    def __init__(self, p, seed, prompt, image):
+        self.p = p
+        self.seed = seed
+        self.prompt = prompt
+        self.image = image
+
+    def apply(self, pattern: str):
+        return pattern.replace("[seed]", str(self.seed)).replace("[prompt_spaces]", self.prompt)[:128]
+
+
+def save_image(image, path, basename, seed=None, prompt=None, extension="png", info=None, forced_filename=None, save_to_dirs=None, **_):
+    Path(path).mkdir(parents=True, exist_ok=True)
+    fullfn = Path(path, f"{forced_filename or basename}.{extension}")
+    image.save(fullfn, format="PNG" if extension == "png" else None, compress_level=0)
+    return str(fullfn), None
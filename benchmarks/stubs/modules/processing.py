@@ -0,0 +1,95 @@
+import json
+import random
+
+from PIL import Image
+
+
+class StableDiffusionProcessing:
+    def __init__(self, **kwargs):
+        self.outpath_samples = ""
+        self.outpath_grids = ""
+        self.prompt = ""
+        self.negative_prompt = ""
+        self.seed = -1
+        self.subseed = -1
+        self.subseed_strength = 0.0
+        self.steps = 20
+        self.cfg_scale = 7.0
+        self.sampler_name = "Euler a"
+        self.width = 512
+        self.height = 512
+        self.batch_size = 1
+        self.n_iter = 1
+        self.restore_faces = False
+        self.tiling = False
+        self.enable_hr = False
+        self.hr_scale = 2.0
+        self.hr_second_pass_steps = 0
+        self.denoising_strength = 0.0
+        self.override_settings = {}
+        self.override_settings_restore_afterwards = True
+        self.extra_generation_params = {}
+        self.do_not_save_grid = False
+        self.do_not_save_samples = False
+        self.all_prompts = []
+        self.all_negative_prompts = []
+        self.all_seeds = []
+        self.all_subseeds = []
+        self.prompts = []
+        self.seeds = []
+        self.__dict__.update(kwargs)
+
+    def sample(self):
+        """fake sampling: tiny flat images, colored from the seed"""
+        return [Image.new("RGB", (8, 8), color=seed % 0xFFFFFF) for seed in self.all_seeds]
+
+    def close(self):
+        return None
+
+
+class StableDiffusionProcessingTxt2Img(StableDiffusionProcessing):
+    pass
+
+
+class Processed:
+    def __init__(self, p, images_list, seed=-1, info="", subseed=None, infotexts=None):
+        self.images = images_list
+        self.seed = seed
+        self.subseed = subseed
+        self.info = info
+        self.prompt = p.prompt
+        self.all_prompts = list(p.all_prompts)
+        self.all_negative_prompts = list(p.all_negative_prompts)
+        self.all_seeds = list(p.all_seeds)
+        self.all_subseeds = list(p.all_subseeds)
+        self.infotexts = infotexts or [info] * len(images_list)
+        self.index_of_first_image = 0
+
+    def js(self):
+        return json.dumps({"prompt": self.prompt, "seed": self.seed, "subseed": self.subseed})
+
+
+def fix_seed(p):
+    if p.seed == -1:
+        p.seed = random.randrange(4294967294)
+    if p.subseed == -1:
+        p.subseed = random.randrange(4294967294)
+
+
+def create_infotext(p, all_prompts, all_seeds, all_subseeds, *_, index=0, **__):
+    return f"{all_prompts[index]}\nSteps: {p.steps}, Sampler: {p.sampler_name}, CFG scale: {p.cfg_scale}, Seed: {all_seeds[index]}"
+
+
+def process_images(p):
+    count = p.batch_size * p.n_iter
+    p.all_prompts = [p.prompt] * count
+    p.all_negative_prompts = [p.negative_prompt] * count
+    p.all_seeds = [int(p.seed) + index for index in range(count)]
+    p.all_subseeds = [int(p.subseed) + index for index in range(count)]
+    for iteration in range(p.n_iter):
+        # like the WebUI, only the batch being rendered is kept in `prompts` and `seeds`
+        batch = slice(iteration * p.batch_size, (iteration + 1) * p.batch_size)
+        p.prompts, p.seeds = p.all_prompts[batch], p.all_seeds[batch]
+    images_list = p.sample()
+    infotexts = [create_infotext(p, p.all_prompts, p.all_seeds, p.all_subseeds, index=index) for index in range(count)]
+    return Processed(p, images_list, p.seed, infotexts[0], p.subseed, infotexts=infotexts)
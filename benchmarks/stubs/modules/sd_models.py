@@ -0,0 +1,27 @@
+from types import SimpleNamespace
+
+CHECKPOINT_COUNT = 500
+
+checkpoints_list = {
+    f"model_{index:03d}.safetensors": SimpleNamespace(title=f"model_{index:03d}.safetensors", hash=f"{index:08x}")
+    for index in range(CHECKPOINT_COUNT)
+}
+
+
+def get_closet_checkpoint_match(search_string):
+    info = checkpoints_list.get(search_string)
+    if info is not None:
+        return info
+    found = sorted([info for title, info in checkpoints_list.items() if search_string in title], key=lambda x: len(x.title))
+    return found[0] if found else None
+
+
+def reload_model_weights(*_, **__):
+    return None
+
+
+def list_models():
+    """reload the checkpoints in place, like the WebUI"""
+    models = dict(checkpoints_list)
+    checkpoints_list.clear()
+    checkpoints_list.update(models)
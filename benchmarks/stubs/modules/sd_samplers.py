@@ -0,0 +1,8 @@
+from types import SimpleNamespace
+
+all_samplers = [
+    SimpleNamespace(name=name)
+    for name in ["Euler a", "Euler", "LMS", "Heun", "DPM2", "DPM2 a", "DPM++ 2M", "DPM++ SDE", "DPM++ 2M Karras", "DDIM", "UniPC"]
+]
+
+all_samplers_map = {sampler.name: sampler for sampler in all_samplers}
@@ -0,0 +1,12 @@
+vae_dict = {f"vae_{index:02d}.safetensors": f"models/VAE/vae_{index:02d}.safetensors" for index in range(20)}
+
+
+def reload_vae_weights(*_, **__):
+    return None
+
+
+def refresh_vae_list():
+    """reload the VAEs in place, like the WebUI"""
+    vaes = dict(vae_dict)
+    vae_dict.clear()
+    vae_dict.update(vaes)
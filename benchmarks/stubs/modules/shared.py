@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+opts = SimpleNamespace(
+    samples_format="png",
+    samples_filename_pattern="",
+    sd_model_checkpoint="model_000.safetensors",
+    sd_vae="Automatic",
+    CLIP_stop_at_last_layers=1,
+    code_former_weight=0.5,
+    face_restoration_model=None,
+    eta_noise_seed_delta=0,
+    uni_pc_order=3,
+    use_scale_latent_for_hires_fix=False,
+    outdir_samples="",
+    outdir_grids="",
+    outdir_txt2img_samples="outputs/txt2img-images",
+    outdir_txt2img_grids="outputs/txt2img-grids",
+)
+
+
+class State:
+    interrupted = False
+    skipped = False
+    job = ""
+    job_count = 0
+    job_no = 0
+    sampling_step = 0
+    textinfo = None
+    processing_has_refined_job_count = False
+
+    def nextjob(self):
+        self.job_no += 1
+        self.sampling_step = 0
+
+    def begin(self, job: str = ""):
+        self.job = job
+        self.interrupted = False
+        self.skipped = False
+
+    def end(self):
+        self.job = ""
+
+
+class TotalTqdm:
+    _tqdm = None
+
+    def updateTotal(self, new_total):  # noqa: N802 (same name as the WebUI)
+        self.total = new_total
+
+
+state = State()
+total_tqdm = TotalTqdm()
+sd_model = None
+face_restorers: list = []
+latent_upscale_modes = {"Latent": {}, "Latent (nearest)": {}}
+sd_upscalers = [SimpleNamespace(name=name) for name in ["None", "Lanczos", "Nearest", "ESRGAN_4x"]]
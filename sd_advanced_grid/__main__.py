@@ -0,0 +1,6 @@
+import sys
+
+from sd_advanced_grid.cli import main
+
+if __name__ == "__main__":  # the thumbnails worker processes import this module when spawned
+    sys.exit(main())
@@ -0,0 +1,250 @@
+# Python
+from __future__ import annotations
+
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from PIL import Image
+
+# Local
+from sd_advanced_grid.journal import atomic_write
+from sd_advanced_grid.utils import logger
+from sd_advanced_grid.web_assets import (
+    ANALYSIS_FILE,
+    FORMATS,
+    THUMBNAILS_FOLDER,
+    cell_of,
+    list_images,
+    write_web_manifest,
+)
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+# ################################# Constants ################################ #
+
+ANALYSIS_FOLDER = "analysis"  # cache of the pixels, the results go to ANALYSIS_FILE
+PIXELS_FILE = "pixels.npy"  # N cells x H x W x C, memory-mapped
+PIXELS_META = "pixels.json"
+SAMPLE_SIZE = 64  # side of the images compared
+LUMA_SIZE = 16  # side of the luminance map used for the structural distance
+FLAT_NORM = 1e-3  # luminance maps below this norm are flat (a uniform image), rounding errors aside
+HASH_SIZE = 8  # average hash of HASH_SIZE x HASH_SIZE bits
+DUPLICATE_BITS = 4  # max hamming distance between two near-duplicates
+CHUNK = 1024  # pairs or rows processed at once
+MAX_CLUSTERS = 100
+
+# ############################## Pixel Cache ################################# #
+
+
+def load_sample(path: Path, size: int) -> bytes:
+    with Image.open(path) as image:
+        image.draft("RGB", (size, size))
+        return image.convert("RGB").resize((size, size), Image.Resampling.BILINEAR).tobytes()
+
+
+def cell_sources(grid_path: Path) -> dict[str, Path]:
+    """first image of each cell, its thumbnail when there is one"""
+    sources: dict[str, Path] = {}
+    for image in list_images(grid_path):
+        cell_id = cell_of(image.name)
+        if cell_id in sources:
+            continue
+        thumbnails = (grid_path.joinpath(THUMBNAILS_FOLDER, f"{image.stem}.{ext}") for _, ext in FORMATS.values())
+        sources[cell_id] = next((path for path in thumbnails if path.exists()), image)
+    return sources
+
+
+def load_pixels(grid_path: Path, size: int = SAMPLE_SIZE, rebuild: bool = False) -> tuple[list[str], np.ndarray]:
+    """
+    cell ids and their pixels as a read-only memory map,
+    the cache is only built again when a source file is added, removed or updated
+    """
+    folder = grid_path.joinpath(ANALYSIS_FOLDER)
+    folder.mkdir(exist_ok=True)
+    sources = cell_sources(grid_path)
+    if not sources:
+        raise RuntimeError(f"No images found in {grid_path}")
+    signature = hashlib.sha1(str(size).encode("utf-8"))
+    for cell_id, path in sources.items():
+        signature.update(f"{cell_id}:{path.name}:{path.stat().st_mtime_ns}\n".encode("utf-8"))
+
+    meta_path, pixels_path = folder.joinpath(PIXELS_META), folder.joinpath(PIXELS_FILE)
+    meta = json.loads(meta_path.read_text(encoding="UTF-8")) if meta_path.exists() else {}
+    if rebuild or meta.get("signature") != signature.hexdigest() or not pixels_path.exists():
+        logger.info(f"Caching the pixels of {len(sources)} cells")
+        pixels = open_memmap(pixels_path, mode="w+", dtype=np.uint8, shape=(len(sources), size, size, 3))
+        with ProcessPoolExecutor() as executor:
+            samples = executor.map(load_sample, sources.values(), [size] * len(sources), chunksize=16)
+            for row, sample in enumerate(samples):
+                pixels[row] = np.frombuffer(sample, dtype=np.uint8).reshape(size, size, 3)
+        pixels.flush()
+        del pixels
+        meta = {"signature": signature.hexdigest(), "cells": list(sources)}
+        atomic_write(meta_path, json.dumps(meta))
+    return meta["cells"], np.load(pixels_path, mmap_mode="r")
+
+
+# ################################# Metrics ################################## #
+
+
+def chunks(total: int, size: int = CHUNK) -> Iterator[slice]:
+    for start in range(0, total, size):
+        yield slice(start, min(start + size, total))
+
+
+def luma_maps(pixels: np.ndarray) -> np.ndarray:
+    """normalized luminance maps (LUMA_SIZE x LUMA_SIZE) of every cell, built by batches, all zeros when flat"""
+    count, size = pixels.shape[0], pixels.shape[1]
+    block = size // LUMA_SIZE
+    maps = np.empty((count, LUMA_SIZE * LUMA_SIZE), dtype=np.float32)
+    weights = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    for part in chunks(count):
+        luma = pixels[part, : block * LUMA_SIZE, : block * LUMA_SIZE].astype(np.float32) @ weights
+        luma = luma.reshape(-1, LUMA_SIZE, block, LUMA_SIZE, block).mean(axis=(2, 4)).reshape(-1, LUMA_SIZE**2)
+        luma -= luma.mean(axis=1, keepdims=True)
+        norms = np.linalg.norm(luma, axis=1, keepdims=True)
+        maps[part] = np.divide(luma, norms, out=np.zeros_like(luma), where=norms > FLAT_NORM)
+    return maps
+
+
+def pair_distances(pixels: np.ndarray, maps: np.ndarray, first: np.ndarray, second: np.ndarray):
+    """
+    mean absolute pixel difference (0-1) and structural distance (1 - correlation, 0-1) of pairs of cells,
+    two flat cells have the same structure, a flat cell has no correlation with any other
+    """
+    pixel = np.empty(len(first), dtype=np.float32)
+    for part in chunks(len(first)):
+        diff = pixels[first[part]].astype(np.int16) - pixels[second[part]]
+        pixel[part] = np.abs(diff).mean(axis=(1, 2, 3)) / 255
+    structure = (1 - np.einsum("ij,ij->i", maps[first], maps[second])) / 2
+    flat = ~maps.any(axis=1)
+    structure[flat[first] & flat[second]] = 0.0
+    return pixel, structure
+
+
+def cell_grid(cell_ids: list[str], lengths: list[int]) -> np.ndarray:
+    """row of each cell in a dense array of axis indexes (-1 when missing)"""
+    grid = np.full(lengths, -1, dtype=np.int64)
+    for row, cell_id in enumerate(cell_ids):
+        if len(cell_id) != 2 * len(lengths):
+            continue  # axis with more values than a 2 characters id can hold
+        # ids are made of 2 characters per axis, the first axis last
+        indexes = tuple(int(cell_id[pos : pos + 2], 36) - 1 for pos in range(0, len(cell_id), 2))[::-1]
+        if all(0 <= index < length for index, length in zip(indexes, lengths)):
+            grid[indexes] = row
+    return grid
+
+
+def axis_sensitivity(pixels: np.ndarray, maps: np.ndarray, grid: np.ndarray, axes: list[dict[str, Any]]):
+    """distance between cells for each step along an axis, every other axis being fixed"""
+    sensitivity = []
+    for position, axis in enumerate(axes):
+        moved = np.moveaxis(grid, position, -1)
+        steps = []
+        pixel_sum = structure_sum = 0.0
+        total = 0
+        for index in range(moved.shape[-1] - 1):
+            first, second = moved[..., index].ravel(), moved[..., index + 1].ravel()
+            rendered = (first >= 0) & (second >= 0)
+            first, second = first[rendered], second[rendered]
+            pixel, structure = pair_distances(pixels, maps, first, second)
+            step = {"from": axis["values"][index], "to": axis["values"][index + 1], "pairs": int(len(first))}
+            if len(first):
+                step.update(pixel=float(pixel.mean()), structure=float(structure.mean()))
+                pixel_sum += float(pixel.sum())
+                structure_sum += float(structure.sum())
+                total += len(first)
+            steps.append(step)
+        sensitivity.append(
+            {
+                "axis": axis["label"],
+                "param": axis["param"],
+                "pairs": total,
+                "pixel": pixel_sum / total if total else None,
+                "structure": structure_sum / total if total else None,
+                "steps": steps,
+            }
+        )
+    return sorted(sensitivity, key=lambda axis: axis["pixel"] or 0.0, reverse=True)
+
+
+def duplicate_clusters(cell_ids: list[str], maps: np.ndarray, max_bits: int = DUPLICATE_BITS) -> list[list[str]]:
+    """
+    group cells whose average hashes differ by `max_bits` at most,
+    flat cells have no structure to hash and are left out (see `flat_cells`)
+    """
+    structured = maps.any(axis=1)
+    cell_ids = [cell_id for cell_id, keep in zip(cell_ids, structured) if keep]
+    maps = maps[structured]
+    if not cell_ids:
+        return []
+    size = LUMA_SIZE // HASH_SIZE
+    reduced = maps.reshape(-1, HASH_SIZE, size, HASH_SIZE, size).mean(axis=(2, 4)).reshape(-1, HASH_SIZE**2)
+    packed = np.packbits(reduced > np.median(reduced, axis=1, keepdims=True), axis=1)
+    # identical hashes are compared once
+    hashes, inverse = np.unique(packed, axis=0, return_inverse=True)
+    bits = np.unpackbits(hashes, axis=1).astype(np.float32)
+    parents = np.arange(len(hashes))
+
+    def find(node: int) -> int:
+        while parents[node] != node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    for part in chunks(len(hashes), CHUNK // 4):
+        # hamming distance through dot products, only the upper triangle is kept
+        distances = bits[part] @ (1 - bits).T + (1 - bits[part]) @ bits.T
+        rows, cols = np.nonzero(distances <= max_bits)
+        rows += part.start
+        for row, col in zip(rows[rows < cols], cols[rows < cols]):
+            parents[find(row)] = find(col)
+
+    clusters: dict[int, list[str]] = {}
+    for row, cell_id in zip(inverse.reshape(-1), cell_ids):
+        clusters.setdefault(find(row), []).append(cell_id)
+    return sorted((cells for cells in clusters.values() if len(cells) > 1), key=len, reverse=True)
+
+
+def flat_cells(cell_ids: list[str], maps: np.ndarray) -> list[str]:
+    """cells of a uniform color (all zeros luminance map), e.g. black images from a broken sampler or VAE"""
+    return [cell_id for cell_id, structured in zip(cell_ids, maps.any(axis=1)) if not structured]
+
+
+# ################################# Analysis ################################# #
+
+
+def analyse_grid(grid_path: Path, size: int = SAMPLE_SIZE, max_bits: int = DUPLICATE_BITS, rebuild: bool = False):
+    """rank the axes by their impact on the images and find near-duplicate cells"""
+    config_path = grid_path.joinpath("config.json")
+    if not config_path.exists():
+        raise RuntimeError(f"No grid found in {grid_path}")
+    if size < LUMA_SIZE:
+        raise RuntimeError(f"Images must be compared at {LUMA_SIZE} pixels or more")
+    axes = json.loads(config_path.read_text(encoding="UTF-8"))["axis"]
+    cell_ids, pixels = load_pixels(grid_path, size, rebuild)
+
+    maps = luma_maps(pixels)
+    grid = cell_grid(cell_ids, [len(axis["values"]) for axis in axes])
+    clusters = duplicate_clusters(cell_ids, maps, max_bits)
+    flat = flat_cells(cell_ids, maps)
+    analysis = {
+        "cells": len(cell_ids),
+        "sensitivity": axis_sensitivity(pixels, maps, grid, axes),
+        "duplicates": {"clusters": len(clusters), "cells": sum(map(len, clusters)), "top": clusters[:MAX_CLUSTERS]},
+        "flat": {"cells": len(flat), "ids": flat},
+    }
+    atomic_write(grid_path.joinpath(ANALYSIS_FILE), json.dumps(analysis, indent=2))
+    write_web_manifest(grid_path)
+    for axis in analysis["sensitivity"]:
+        if axis["pixel"] is not None:
+            logger.info(f"{axis['axis']}: pixel {axis['pixel']:.4f}, structure {axis['structure']:.4f}")
+    return analysis
@@ -0,0 +1,157 @@
+# Python
+from __future__ import annotations
+
+import threading
+from copy import copy
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+# Local
+from sd_advanced_grid.grid_plan import build_axes, plan_grid
+from sd_advanced_grid.grid_settings import SHARED_OPTS
+from sd_advanced_grid.utils import logger
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from modules.processing import Processed
+    from modules.processing import StableDiffusionProcessingTxt2Img as SD_Proc
+
+    from sd_advanced_grid.grid_cell import GridCell
+    from sd_advanced_grid.grid_plan import GridPlan
+    from sd_advanced_grid.grid_spec import GridSpec
+
+# ################################## Helpers ################################# #
+
+
+class SharedOptionsCache:
+    def __enter__(self):
+        from modules.shared import opts  # pylint: disable=import-outside-toplevel
+
+        for key in SHARED_OPTS:
+            setattr(self, key, getattr(opts, key, None))
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        from modules import sd_models, sd_vae  # pylint: disable=import-outside-toplevel
+        from modules.shared import opts  # pylint: disable=import-outside-toplevel
+
+        for key in SHARED_OPTS:
+            setattr(opts, key, getattr(self, key))
+        sd_models.reload_model_weights()
+        sd_vae.reload_vae_weights()
+
+
+# ################################# Run Handle ############################### #
+
+
+class GridRun:
+    """handle on a grid generation, the UI and headless runs both go through it"""
+
+    def __init__(self, spec: GridSpec, sd_processing: SD_Proc):
+        self.spec = spec
+        self.sd_processing = sd_processing
+        self.plan: GridPlan | None = None
+        self.result: Processed | None = None
+        self.error: BaseException | None = None
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+        self.__thread: threading.Thread | None = None
+
+    @property
+    def total(self):
+        return self.plan.cells if self.plan else 0
+
+    @property
+    def progress(self) -> float:
+        """ratio of cells handled so far (rendered, skipped or failed)"""
+        if not self.total:
+            return 0.0
+        return (self.done + self.skipped + self.failed) / self.total
+
+    @property
+    def running(self):
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def _on_cell(self, cell: GridCell):
+        if cell.skipped:
+            self.skipped += 1
+        elif cell.failed:
+            self.failed += 1
+        else:
+            self.done += 1
+
+    def run(self) -> Processed:
+        # pylint: disable=import-outside-toplevel
+        from modules import processing
+
+        from sd_advanced_grid.process_axes import generate_grid
+
+        spec = self.spec
+        grid_name = spec.name or f"{datetime.now().strftime('%d_%m_%Y_%H_%M_%S')}"
+
+        # Clean up default params
+        adv_proc = copy(self.sd_processing)
+        processing.fix_seed(adv_proc)
+        adv_proc.override_settings_restore_afterwards = False
+        adv_proc.n_iter = 1
+        adv_proc.do_not_save_grid = True
+        adv_proc.do_not_save_samples = True
+        batches = adv_proc.batch_size if spec.allow_batches else 1
+        adv_proc.batch_size = adv_proc.batch_size if spec.allow_batches else 1
+
+        if spec.force_vae:
+            # adv_proc.override_settings["sd_vae_as_default"] = False
+            pass
+
+        axes = build_axes(spec.selection(), proc=adv_proc)
+        self.plan = plan_grid(axes, adv_proc)
+
+        with SharedOptionsCache():
+            self.result = generate_grid(
+                adv_proc,
+                grid_name,
+                spec.overwrite,
+                batches,
+                spec.dry_run,
+                axes,
+                spec.for_web,
+                spec=spec,
+                callback=self._on_cell,
+            )
+
+        for axis in axes:
+            axis.unset()
+
+        logger.info("Done!")
+        return self.result
+
+    def __run_safe(self):
+        try:
+            self.run()
+        except BaseException as exc:  # pylint: disable=broad-exception-caught
+            self.error = exc
+
+    def start(self) -> GridRun:
+        """run the grid in a background thread"""
+        if self.running:
+            raise RuntimeError("The grid is already running")
+        self.__thread = threading.Thread(target=self.__run_safe, name="adv-grid", daemon=True)
+        self.__thread.start()
+        return self
+
+    def wait(self, timeout: float | None = None) -> Processed | None:
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def run_grid(spec: GridSpec, sd_processing: SD_Proc, background: bool = False) -> GridRun:
+    """programmatic entry point, returns a handle to follow the progress and get the results"""
+    grid_run = GridRun(spec, sd_processing)
+    if background:
+        return grid_run.start()
+    grid_run.run()
+    return grid_run
@@ -1,26 +1,56 @@
-# SD-WebUI
-from modules import sd_models, sd_samplers, sd_vae, shared
-
 # Local
-from sd_advanced_grid.grid_settings import AxisModel, AxisNothing, AxisOption, AxisReplace, AxisVae
+from sd_advanced_grid.choices import ChoiceList
+from sd_advanced_grid.grid_settings import AxisNothing, AxisOption, AxisReplace
+from sd_advanced_grid.resolved_axes import AxisModel, AxisSampler, AxisVae
+from sd_advanced_grid.utils import clean_name
 
 # TODO: create a system to easily add options and refer to it by field name
 
+# ############################### Choice Lists ############################### #
+# SD-WebUI modules are loaded lazily so options can be used outside of the WebUI,
+# a choice list of `None` means the list cannot be resolved (e.g. offline planning)
+
+checkpoint_choices = ChoiceList(
+    "sd_models",
+    lambda sd_models: (sd_models.checkpoints_list,),
+    lambda checkpoints: sorted(checkpoints, key=str.casefold),
+)
+vae_choices = ChoiceList(
+    "sd_vae",
+    lambda sd_vae: (sd_vae.vae_dict,),
+    lambda vaes: ["None", "Automatic"] + sorted(vaes, key=str.casefold),
+)
+sampler_choices = ChoiceList(
+    "sd_samplers",
+    lambda sd_samplers: (sd_samplers.all_samplers,),
+    lambda samplers: [x.name for x in samplers],
+)
+face_restorer_choices = ChoiceList(
+    "shared",
+    lambda shared: (shared.face_restorers,),
+    lambda restorers: ["None", "Default"] + [model.name() for model in restorers],
+)
+upscaler_choices = ChoiceList(
+    "shared",
+    lambda shared: (shared.latent_upscale_modes, shared.sd_upscalers),
+    lambda modes, upscalers: [*modes, *[x.name for x in upscalers]] + ["None"],
+)
+
 # ############################## Default Options ############################# #
 
 axis_options: list[AxisOption] = [
     # fmt: off
     # # Common to txt2img and img2img
     AxisNothing("Nothing"),
-    AxisModel("Checkpoint",                 type=str,                   field="sd_model_checkpoint",        choices=lambda: sorted(sd_models.checkpoints_list, key=str.casefold)),
-    AxisVae("VAE",                          type=str,                   field="sd_vae",                     choices=lambda: ["None", "Automatic"] + sorted(sd_vae.vae_dict, key=str.casefold)),
+    AxisModel("Checkpoint",                 type=str,                   field="sd_model_checkpoint",        choices=checkpoint_choices),
+    AxisVae("VAE",                          type=str,                   field="sd_vae",                     choices=vae_choices),
     AxisOption("Seed",                      type=str,                   field="seed"),
     AxisOption("Steps",                     type=int,   max=200,        field="steps"),
     AxisOption("ClipSkip",                  type=int,   min=1,  max=12, field="CLIP_stop_at_last_layers"),
-    AxisOption("Sampler",                   type=str,                   field="sampler_name",               choices=lambda: [x.name for x in sd_samplers.all_samplers]),
+    AxisSampler("Sampler",                  type=str,                   field="sampler_name",               choices=sampler_choices),
     AxisOption("CFG Scale",                 type=float, max=30,         field="cfg_scale"),
     # Misc
-    AxisOption("Restore Faces",             type=str,                   field="face_restoration_model",     toggles="restore_faces",    choices=lambda: ["None", "Default"] + [model.name() for model in shared.face_restorers]),
+    AxisOption("Restore Faces",             type=str,                   field="face_restoration_model",     toggles="restore_faces",    choices=face_restorer_choices),
     AxisOption("CodeFormer Weight",         type=float,                 field="code_former_weight",         toggles="restore_faces"),
     AxisOption("Tiling",                    type=bool,                  field="tiling"),
     # AxisOption("Width",                     type=int,                   field="width"),
@@ -43,10 +73,10 @@ axis_options: list[AxisOption] = [
     AxisOption("UniPC Order",               type=int,                   field="uni_pc_order",               cost=0.5),
 
     # # txt2img
-    AxisOption("HighRes Upscaler",          type=str,                   field="hr_upscaler",                toggles="enable_hr",    choices=lambda: [*shared.latent_upscale_modes, *[x.name for x in shared.sd_upscalers]] + ["None"]),
-    AxisOption("HighRes Scale",             type=float, min=1,  max=4,  field="hr_scale",                   toggles="enable_hr"),
-    AxisOption("HighRes Steps",             type=int,   max=200,        field="hr_second_pass_steps",       toggles="enable_hr"),
-    AxisOption("Denoising",                 type=float,                 field="denoising_strength",         toggles="enable_hr"),
+    AxisOption("HighRes Upscaler",          type=str,                   field="hr_upscaler",                toggles="enable_hr",    mode="txt2img", choices=upscaler_choices),
+    AxisOption("HighRes Scale",             type=float, min=1,  max=4,  field="hr_scale",                   toggles="enable_hr",    mode="txt2img"),
+    AxisOption("HighRes Steps",             type=int,   max=200,        field="hr_second_pass_steps",       toggles="enable_hr",    mode="txt2img"),
+    AxisOption("Denoising",                 type=float,                 field="denoising_strength",         toggles="enable_hr",    mode="txt2img"),
     # -> opts.use_old_hires_fix_width_height
     # AxisOption("HighRes Resize Width",      type=int,                   field="hr_resize_x"),
     # AxisOption("HighRes Resize Height",     type=int,                   field="hr_resize_y"),
@@ -54,8 +84,25 @@ axis_options: list[AxisOption] = [
     # AxisOption("HighRes Upscale to Width",  type=int,                   field="hr_upscale_to_x"),
     # AxisOption("HighRes Upscale to Height", type=int,                   field="hr_upscale_to_y"),
     # # img2img
-    # AxisOption("Sampler",                   type=str,                   field="sampler_name",                     choices=lambda: [x.name for x in sd_samplers.all_samplers]),
-    # AxisOption("Denoising",                 type=float,                 field="denoising_strength"),
-    # AxisOption("Image Mask Weight",         type=float,                 field="inpainting_mask_weight"),
-    # AxisOption("Image CFG Scale",           type=float, max=3,          field="image_cfg_scale"),
+    AxisOption("Image Denoising",           type=float,                 field="denoising_strength",                                 mode="img2img"),
+    AxisOption("Image Mask Weight",         type=float,                 field="inpainting_mask_weight",                             mode="img2img"),
+    AxisOption("Image CFG Scale",           type=float, max=3,          field="image_cfg_scale",                                    mode="img2img"),
 ]
+
+
+def is_available(axis: AxisOption, img2img: bool | None = None) -> bool:
+    """options specific to txt2img or img2img, `None` to accept both"""
+    return img2img is None or axis.mode is None or axis.mode == ("img2img" if img2img else "txt2img")
+
+
+def find_axis_index(key: int | str, img2img: bool | None = None) -> int:
+    """find an axis option by its position, label or id"""
+    if isinstance(key, int):
+        if 0 <= key < len(axis_options) and is_available(axis_options[key], img2img):
+            return key
+        raise RuntimeError(f"Unknown axis: {key}")
+    name = clean_name(key)
+    for index, axis in enumerate(axis_options):
+        if name in {clean_name(axis.label), axis.id} and is_available(axis, img2img):
+            return index
+    raise RuntimeError(f"Unknown axis: {key}")
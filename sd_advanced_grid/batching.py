@@ -0,0 +1,116 @@
+# Python
+from __future__ import annotations
+
+import json
+import math
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING
+
+# Local
+from sd_advanced_grid.journal import atomic_write
+from sd_advanced_grid.utils import logger, webui_module
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from modules.processing import StableDiffusionProcessing as SD_Proc
+
+# ################################# Constants ################################ #
+
+LIMITS_FILE = "adv_grid_batch_limits.json"
+GROW_AFTER = 3  # successful cells needed before trying a larger batch
+
+# ############################# Helper Functions ############################# #
+
+
+def is_out_of_memory(err: BaseException) -> bool:
+    # torch.cuda.OutOfMemoryError is a RuntimeError, older versions only have the message
+    return type(err).__name__ == "OutOfMemoryError" or "out of memory" in str(err).lower()
+
+
+def batch_class(proc: SD_Proc) -> str:
+    """cells sharing the same class are expected to use the same amount of memory and render at the same speed"""
+    checkpoint = getattr(proc, "override_settings", {}).get("sd_model_checkpoint")
+    if checkpoint is None:
+        shared = webui_module("shared")
+        checkpoint = getattr(shared.opts, "sd_model_checkpoint", None) if shared else None
+    hr_scale = proc.hr_scale if getattr(proc, "enable_hr", False) else 1
+    return f"{proc.width}x{proc.height}|{hr_scale}|{checkpoint}"
+
+
+# ############################### Batch Sizing ############################### #
+
+
+@dataclass
+class BatchLimit:
+    size: int
+    failed: int = 0  # smallest size known to run out of memory
+    streak: int = 0
+
+
+class BatchSizer:
+    """
+    learn the largest batch fitting in memory for each class of cells,
+    a cell always renders the requested amount of images, split in several batches when needed
+    """
+
+    def __init__(self, target: int, path: Path | None = None):
+        self.target = target
+        self.path = path
+        self.sizes = [size for size in range(1, target + 1) if target % size == 0]
+        self.limits: dict[str, BatchLimit] = {}
+        if path is not None and path.exists():
+            try:
+                data = json.loads(path.read_text(encoding="UTF-8"))
+                self.limits = {key: BatchLimit(**limit) for key, limit in data.items()}
+            except (ValueError, TypeError):
+                logger.warn(f"Ignoring invalid batch limits from {path}")
+
+    def __fit(self, size: int):
+        """largest size dividing the target without exceeding the given size"""
+        return max(value for value in self.sizes if value <= max(size, 1))
+
+    def __limit(self, proc: SD_Proc):
+        return self.limits.setdefault(batch_class(proc), BatchLimit(self.target))
+
+    def __save(self):
+        if self.path is not None:
+            data = {key: asdict(limit) for key, limit in self.limits.items()}
+            atomic_write(self.path, json.dumps(data, indent=2))
+
+    def apply(self, proc: SD_Proc):
+        size = self.__fit(min(self.target, self.__limit(proc).size))
+        proc.batch_size = size
+        proc.n_iter = math.ceil(self.target / size)
+
+    def success(self, proc: SD_Proc):
+        limit = self.__limit(proc)
+        if limit.size >= self.target:
+            return
+        limit.streak += 1
+        if limit.streak < GROW_AFTER:
+            return
+        limit.streak = 0
+        grown = self.__fit(min(limit.size * 2, self.target))
+        if limit.failed and grown >= limit.failed:
+            grown = self.__fit(limit.failed - 1)
+        if grown > limit.size:
+            logger.info(f"Increasing batch size to {grown} for {batch_class(proc)}")
+            limit.size = grown
+            self.__save()
+
+    def failure(self, proc: SD_Proc) -> bool:
+        """halve the batch after running out of memory, tell if the cell can be tried again"""
+        size = proc.batch_size
+        if size <= 1:
+            return False
+        limit = self.__limit(proc)
+        limit.failed = min(limit.failed or size, size)
+        limit.size = self.__fit(size // 2)
+        limit.streak = 0
+        self.__save()
+        logger.warn(f"Out of memory with a batch of {size}, retrying with {limit.size} for {batch_class(proc)}")
+        self.apply(proc)
+        return True
@@ -0,0 +1,218 @@
+# Python
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+# Local
+from sd_advanced_grid.utils import webui_module
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Collection, Iterable
+
+# ################################# Constants ################################ #
+
+GRAM_SIZE = 3
+# WebUI functions reloading their collections in place (same objects), each call invalidates the lists and handles
+REFRESHERS = {"sd_models": "list_models", "sd_vae": "refresh_vae_list"}
+
+# ############################# Helper Functions ############################# #
+
+
+class RefreshWatch:
+    """version of the WebUI collections, increased by their refresh functions once they are wrapped"""
+
+    def __init__(self, refreshers: dict[str, str]):
+        self.refreshers = refreshers
+        self.version = 0
+        self.__watched: set[str] = set()
+
+    def invalidate(self):
+        self.version += 1
+
+    def watch(self, name: str, module: Any):
+        if name in self.__watched:
+            return
+        self.__watched.add(name)
+        original = getattr(module, self.refreshers.get(name, ""), None)
+        if original is None:
+            return
+
+        def refresh(*args, **kwargs):
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.invalidate()
+
+        setattr(module, self.refreshers[name], refresh)
+
+
+refresh_watch = RefreshWatch(REFRESHERS)
+
+
+def watched_module(name: str):
+    """SD-WebUI module (`None` outside of the WebUI) whose refreshes are followed"""
+    module = webui_module(name)
+    if module is not None:
+        refresh_watch.watch(name, module)
+    return module
+
+
+def fingerprint(collections: Iterable[Collection]) -> tuple:
+    """
+    identity of collections in constant time, changes when one is replaced, resized or refreshed
+    (an item renamed in place without a refresh goes unnoticed)
+    """
+    return (refresh_watch.version, *((id(collection), len(collection)) for collection in collections))
+
+
+def grams(text: str):
+    return {text[pos : pos + GRAM_SIZE] for pos in range(len(text) - GRAM_SIZE + 1)}
+
+
+# ############################### Choice Index ############################### #
+
+
+class ChoiceIndex:
+    """lookup of the closest choice: exact match, or the shortest choice containing the name"""
+
+    def __init__(self, items: list[str]):
+        self.items = items
+        self.exact = set(items)
+        # stable sort, same order as sorting the matches by length
+        self.by_length = sorted(range(len(items)), key=lambda index: len(items[index]))
+        self.rank = {index: rank for rank, index in enumerate(self.by_length)}
+        self.__grams: dict[str, set[int]] | None = None
+        self.__found: dict[str, str] = {}
+
+    @property
+    def grams(self):
+        """n-grams of every choice, only built when a partial name is looked up"""
+        if self.__grams is None:
+            self.__grams = {}
+            for index, item in enumerate(self.items):
+                for gram in grams(item):
+                    self.__grams.setdefault(gram, set()).add(index)
+        return self.__grams
+
+    def __candidates(self, name: str):
+        if len(name) < GRAM_SIZE:
+            return self.by_length
+        candidates: set[int] | None = None
+        for gram in grams(name):
+            matching = self.grams.get(gram)
+            if not matching:
+                return []
+            candidates = matching if candidates is None else candidates & matching
+        return sorted(candidates or [], key=self.rank.__getitem__)
+
+    def closest(self, name: str) -> str:
+        if name in self.exact:
+            return name
+        if name not in self.__found:
+            found = (self.items[index] for index in self.__candidates(name) if name in self.items[index])
+            self.__found[name] = next(found, "")
+        return self.__found[name]
+
+
+# ############################### Choice List ################################ #
+
+
+class ChoiceList:
+    """
+    choices of an axis built from SD-WebUI collections,
+    the list and its index are only rebuilt when one of the collections changes
+    """
+
+    def __init__(self, module: str, sources: Callable[[Any], tuple[Collection, ...]], build: Callable[..., list[str]]):
+        self.module = module
+        self.sources = sources
+        self.build = build
+        self.__fingerprint: tuple | None = None
+        self.__items: list[str] = []
+        self.__index: ChoiceIndex | None = None
+
+    def __refresh(self) -> bool:
+        module = watched_module(self.module)
+        if module is None:
+            return False
+        collections = self.sources(module)
+        current = fingerprint(collections)
+        if current != self.__fingerprint:
+            self.__items = self.build(*collections)
+            self.__index = None
+            self.__fingerprint = current
+        return True
+
+    def __call__(self) -> list[str] | None:
+        """current list of choices, `None` outside of the WebUI (the list must not be modified)"""
+        return self.__items if self.__refresh() else None
+
+    def closest(self, name: str) -> str | None:
+        if not self.__refresh():
+            return None
+        if self.__index is None:
+            self.__index = ChoiceIndex(self.__items)
+        return self.__index.closest(name)
+
+    def invalidate(self):
+        self.__fingerprint = None
+
+    def __deepcopy__(self, _):
+        # shared by every copy of the axis options
+        return self
+
+
+# ############################### Handle Cache ############################### #
+
+
+class HandleCache:
+    """
+    resolve values into SD-WebUI handles (e.g. checkpoint info) once,
+    the cache is dropped when one of the collections changes
+    """
+
+    def __init__(self, module: str, sources: Callable[[Any], tuple[Collection, ...]], resolve: Callable[[Any, Any], Any]):
+        self.module = module
+        self.sources = sources
+        self.resolve = resolve
+        self.__fingerprint: tuple | None = None
+        self.__handles: dict[Any, Any] = {}
+
+    def resolve_all(self, values: Iterable[Any]) -> dict[Any, Any] | None:
+        """handles of every distinct value (`None` for unknown ones), `None` outside of the WebUI"""
+        module = watched_module(self.module)
+        if module is None:
+            return None
+        current = fingerprint(self.sources(module))
+        if current != self.__fingerprint:
+            self.__handles = {}
+            self.__fingerprint = current
+        for value in dict.fromkeys(values):
+            if value not in self.__handles:
+                self.__handles[value] = self.resolve(module, value)
+        return {value: self.__handles[value] for value in dict.fromkeys(values)}
+
+    def __deepcopy__(self, _):
+        return self
+
+
+# ############################### Registries ################################# #
+
+# values resolved once and shared by every grid until the WebUI lists change
+checkpoint_handles = HandleCache(
+    "sd_models",
+    lambda sd_models: (sd_models.checkpoints_list,),
+    lambda sd_models, value: sd_models.get_closet_checkpoint_match(value),
+)
+vae_handles = HandleCache(
+    "sd_vae",
+    lambda sd_vae: (sd_vae.vae_dict,),
+    lambda sd_vae, value: value if value in {"None", "Automatic"} else sd_vae.vae_dict.get(value, None),
+)
+sampler_handles = HandleCache(
+    "sd_samplers",
+    lambda sd_samplers: (sd_samplers.all_samplers,),
+    lambda sd_samplers, value: sd_samplers.all_samplers_map.get(value, None),
+)
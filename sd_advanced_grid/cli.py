@@ -0,0 +1,179 @@
+# Python
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+
+# Local
+from sd_advanced_grid.grid_plan import build_axes, grid_folder, plan_grid
+from sd_advanced_grid.grid_spec import GridSpec
+from sd_advanced_grid.logs import GRID_JSON_FILE, LEVELS, logger
+from sd_advanced_grid.web_assets import FORMATS, THUMBNAIL_FORMAT, THUMBNAIL_SIZE, backfill_all
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+# ################################# Constants ################################ #
+
+# SD-WebUI defaults used when planning without the WebUI
+DEFAULT_PARAMS = {
+    "prompt": "",
+    "negative_prompt": "",
+    "steps": 20,
+    "batch_size": 1,
+    "enable_hr": False,
+    "hr_second_pass_steps": 0,
+}
+
+# ################################# Commands ################################# #
+
+
+def plan_command(spec: GridSpec, args: argparse.Namespace):
+    """validate a grid and estimate its cost without SD-WebUI"""
+    proc = SimpleNamespace(**{**DEFAULT_PARAMS, **spec.params})
+    if not spec.allow_batches:
+        proc.batch_size = 1
+    plan = plan_grid(build_axes(spec.selection(), proc=proc), proc)
+    grid_path = grid_folder(args.outdir, spec.name) if args.outdir and spec.name else None
+    print(json.dumps(plan.summary(grid_path), indent=2))
+    return 1 if plan.invalid and args.strict else 0
+
+
+def webui_folder(path: str | None) -> Path:
+    """SD-WebUI folder, by default the one this extension is installed in (`extensions/<name>`)"""
+    folder = Path(path) if path else Path(__file__).resolve().parents[3]
+    if not folder.joinpath("webui.py").is_file():
+        raise RuntimeError(f"No SD-WebUI found in {folder}, use --webui to give its folder")
+    return folder.resolve()
+
+
+def run_command(spec: GridSpec, args: argparse.Namespace):
+    """render a grid headlessly with the SD-WebUI this extension is installed in"""
+    folder = webui_folder(args.webui)
+    caller_folder = Path.cwd()  # init images are relative to where the command was launched
+    # the WebUI parses the command line when imported, it only gets its own options
+    sys.argv = [str(folder.joinpath("webui.py")), *args.webui_args]
+    sys.path.insert(0, str(folder))
+    os.chdir(folder)
+    if folder.joinpath("modules", "initialize.py").is_file():
+        # same start-up as webui.py (1.6+), where `webui.initialize` is the module
+        initialize = importlib.import_module("modules.initialize")
+        initialize.imports()
+        initialize.initialize()
+    else:
+        importlib.import_module("webui").initialize()  # older versions
+
+    # pylint: disable=import-outside-toplevel
+    from modules import processing, shared
+
+    from sd_advanced_grid.api import run_grid
+
+    opts = shared.opts
+    params = dict(spec.params)
+    if params.get("init_images"):
+        # img2img grid, the init images are given as paths
+        from PIL import Image
+
+        params["init_images"] = [
+            Image.open(caller_folder.joinpath(path)).convert("RGB") for path in params["init_images"]
+        ]
+        sd_processing = processing.StableDiffusionProcessingImg2Img(
+            sd_model=shared.sd_model,
+            outpath_samples=opts.outdir_samples or opts.outdir_img2img_samples,
+            outpath_grids=opts.outdir_grids or opts.outdir_img2img_grids,
+            **params,
+        )
+    else:
+        sd_processing = processing.StableDiffusionProcessingTxt2Img(
+            sd_model=shared.sd_model,
+            outpath_samples=opts.outdir_samples or opts.outdir_txt2img_samples,
+            outpath_grids=opts.outdir_grids or opts.outdir_txt2img_grids,
+            **params,
+        )
+    shared.state.begin(job="adv_grid")
+    try:
+        grid_run = run_grid(spec, sd_processing)
+    finally:
+        shared.state.end()
+    print(json.dumps({"done": grid_run.done, "skipped": grid_run.skipped, "failed": grid_run.failed}))
+    return 1 if grid_run.failed else 0
+
+
+def thumbnails_command(_, args: argparse.Namespace):
+    """create the missing thumbnails of existing grids and write their web manifest"""
+    failed = backfill_all(
+        args.grids, size=args.size, format_name=args.format, quality=args.quality, workers=args.workers, force=args.force
+    )
+    return 1 if failed else 0
+
+
+def analyse_command(_, args: argparse.Namespace):
+    """rank the axes of existing grids by their impact and find near-duplicate cells"""
+    from sd_advanced_grid.analysis import analyse_grid  # pylint: disable=import-outside-toplevel
+
+    for grid_path in args.grids:
+        analysis = analyse_grid(grid_path, size=args.size, max_bits=args.max_bits, rebuild=args.rebuild)
+        duplicates, flat = analysis["duplicates"]["clusters"], analysis["flat"]["cells"]
+        print(json.dumps({"grid": grid_path.name, "duplicates": duplicates, "flat": flat}))
+    return 0
+
+
+# ################################ Entry Point ############################### #
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="sd_advanced_grid", description="Advanced Grid without the Gradio UI")
+    parser.add_argument("--log-level", choices=list(LEVELS), help="minimum level of the messages shown")
+    parser.add_argument("--log-json", action="store_true", help=f"also log each grid into {GRID_JSON_FILE}")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plan_parser = commands.add_parser("plan", help="validate a grid and estimate its cost (dry run)")
+    plan_parser.add_argument("spec", help="grid definition (JSON or YAML)")
+    plan_parser.add_argument("--outdir", help="grid folder root, to count the cells already rendered")
+    plan_parser.add_argument("--strict", action="store_true", help="fail when an axis contains invalid values")
+    plan_parser.set_defaults(handler=plan_command)
+
+    run_parser = commands.add_parser("run", help="render a grid with SD-WebUI")
+    run_parser.add_argument("spec", help="grid definition (JSON or YAML)")
+    run_parser.add_argument("--webui", help="SD-WebUI folder, defaults to the one the extension is installed in")
+    run_parser.epilog = "options given after `--` are passed to SD-WebUI"
+    run_parser.set_defaults(handler=run_command)
+
+    thumbs_parser = commands.add_parser("thumbnails", help="backfill thumbnails and web manifest of existing grids")
+    thumbs_parser.add_argument("grids", type=Path, nargs="+", help="grid folders (adv_grid_*)")
+    thumbs_parser.add_argument("--size", type=int, default=THUMBNAIL_SIZE, help="longest side in pixels")
+    thumbs_parser.add_argument("--format", choices=list(FORMATS), default=THUMBNAIL_FORMAT)
+    thumbs_parser.add_argument("--quality", type=int, default=85, help="quality of lossy formats")
+    thumbs_parser.add_argument("--workers", type=int, help="worker processes (defaults to the CPU count)")
+    thumbs_parser.add_argument("--force", action="store_true", help="recreate up-to-date thumbnails")
+    thumbs_parser.set_defaults(handler=thumbnails_command)
+
+    analyse_parser = commands.add_parser("analyse", help="measure the impact of each axis on existing grids")
+    analyse_parser.add_argument("grids", type=Path, nargs="+", help="grid folders (adv_grid_*)")
+    analyse_parser.add_argument("--size", type=int, default=64, help="side of the images compared, in pixels")
+    analyse_parser.add_argument("--max-bits", type=int, default=4, help="hash bits two near-duplicates may differ by")
+    analyse_parser.add_argument("--rebuild", action="store_true", help="reload the pixels cache")
+    analyse_parser.set_defaults(handler=analyse_command)
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    webui_args: list[str] = []
+    if "--" in argv:
+        position = argv.index("--")
+        argv, webui_args = argv[:position], argv[position + 1 :]
+    args = parser.parse_args(argv)
+    args.webui_args = webui_args
+    logger.configure(args.log_level, json_lines=args.log_json)
+    try:
+        spec = GridSpec.from_file(args.spec) if "spec" in args else None
+        return args.handler(spec, args)
+    except RuntimeError as err:
+        print(f"Error: {err}", file=sys.stderr)
+        return 2
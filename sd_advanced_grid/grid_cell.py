@@ -0,0 +1,223 @@
+# Python
+from __future__ import annotations
+
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+# SD-WebUI
+from modules import devices, processing, sd_models, sd_vae, shared
+from modules.processing import Processed
+from modules.processing import StableDiffusionProcessingTxt2Img as SD_Proc
+
+# Local
+from sd_advanced_grid.batching import is_out_of_memory
+from sd_advanced_grid.grid_plan import file_exist
+from sd_advanced_grid.journal import STARTED, WRITTEN
+from sd_advanced_grid.latent_cache import ENCODER
+from sd_advanced_grid.metrics import StageTimer
+from sd_advanced_grid.output import AxisSet, commit_files, generate_filename, save_thumbnail, write_image
+from sd_advanced_grid.progress import cell_steps
+from sd_advanced_grid.utils import logger
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from sd_advanced_grid.batching import BatchSizer
+    from sd_advanced_grid.journal import RunJournal
+    from sd_advanced_grid.latent_cache import InitLatentCache
+
+# ####################### Logic For Individual Variant ####################### #
+
+@dataclass
+class GridCell:
+    # init
+    cell_id: str
+    proc: SD_Proc
+    axis_set: AxisSet
+    timer: StageTimer = field(default_factory=StageTimer)
+    name_hash: str | None = None  # precomputed hashed filename of the axis set
+    processed: Processed = field(init=False)
+    job_count: int = field(init=False, default=1)
+    skipped: bool = field(init=False, default=False)
+    failed: bool = field(init=False, default=False)
+    # images written under temporary names, with their final name and thumbnail (for web), left to `save`
+    pending: list[tuple[list[tuple[Path, Path]], Path, Path | None]] = field(init=False, default_factory=list)
+
+    def __post_init__(self):
+        if getattr(self.proc, "enable_hr", False):
+            # NOTE: there might be some extensions that add jobs
+            self.job_count *= 2
+
+    @property
+    def status(self):
+        if self.skipped:
+            return "skipped"
+        return "failed" if self.failed else "done"
+
+    def is_rendered(self, save_to: Path, journal: RunJournal | None = None) -> bool:
+        done = journal.is_done(self.cell_id, save_to) if journal is not None else None
+        if done is None:
+            # grid rendered before its journal existed, rely on existing files
+            return file_exist(save_to, self.cell_id)
+        return done
+
+    def __process(self, latents: InitLatentCache | None = None) -> Processed:
+        # time the inner stages of the WebUI processing when they can be hooked
+        timer = self.timer
+        with timer.stage("render"), \
+                timer.patch(processing, ENCODER, "encode"), \
+                (latents.patch(self.proc) if latents is not None else nullcontext()), \
+                timer.patch(sd_models, "reload_model_weights", "model_switch"), \
+                timer.patch(sd_vae, "reload_vae_weights", "vae_switch"), \
+                timer.patch(self.proc, "sample", "sampling"), \
+                timer.patch(self.proc, "sample_hr_pass", "hires"), \
+                timer.patch(processing, "decode_latent_batch", "decode"):
+            return processing.process_images(self.proc)
+
+    def render(self, sizer: BatchSizer | None = None, latents: InitLatentCache | None = None) -> Processed | None:
+        """render the cell, backing off on the batch size when running out of memory"""
+        if sizer is not None:
+            sizer.apply(self.proc)
+        while True:
+            try:
+                processed = self.__process(latents)
+            except RuntimeError as err:
+                if sizer is not None and is_out_of_memory(err) and sizer.failure(self.proc):
+                    devices.torch_gc()
+                    continue
+                logger.error(f"Skipping cell #{self.cell_id} due to a rendering error.")
+                return None
+            if sizer is not None:
+                sizer.success(self.proc)
+            return processed
+
+    def skip(self):
+        """account for a cell already rendered"""
+        # pylint: disable=protected-access
+        self.skipped = True
+        if shared.total_tqdm._tqdm:
+            # update console progessbar
+            shared.total_tqdm._tqdm.update(cell_steps(self.proc))
+        shared.state.nextjob()
+        if getattr(self.proc, "enable_hr", False):
+            # NOTE: not sure if this is needed or automatic, progressbar update is finicky
+            shared.state.nextjob()
+        logger.debug("Skipping cell #%s, file already exist.", args=(self.cell_id,), key="cell_skipped")
+
+    def generate(
+        self,
+        save_to: Path,
+        for_web: bool = False,
+        journal: RunJournal | None = None,
+        sizer: BatchSizer | None = None,
+        latents: InitLatentCache | None = None,
+    ) -> bool:
+        """
+        render the images and write them under temporary names, `False` when there is nothing to save,
+        everything reading the WebUI state (infotexts, file names, format, save callbacks) is done here
+        before the next cell changes it, `save` is left with file operations only
+        """
+        logger.info(
+            "Running image generation for cell %s with the following attributes:",
+            (f"{label}: {value}" for label, value in self.axis_set.values()),
+            args=(self.cell_id,),
+            key="cell_render",
+        )
+
+        if journal is not None:
+            journal.record(self.cell_id, STARTED, images=self.proc.batch_size)
+
+        # All the magic happens here
+        processed = self.render(sizer, latents)
+
+        if shared.state.interrupted:
+            return False
+
+        if shared.state.skipped:
+            # pylint: disable=protected-access
+            self.skipped = True
+            shared.state.skipped = False
+            if shared.total_tqdm._tqdm:
+                # update console progessbar (to be tested)
+                shared.total_tqdm._tqdm.update(cell_steps(self.proc) - shared.state.sampling_step)
+            logger.warn(f"Skipping cell #{self.cell_id}, requested by the system.")
+            return False
+
+        if not processed or not processed.images or not any(processed.images):
+            logger.warn(f"No images were generated for cell #{self.cell_id}")
+            self.failed = True
+            return False
+
+        version = ""
+        filename_prefix = f"adv_cell-{self.cell_id}-"
+        file_ext = shared.opts.samples_format
+
+        for idx, image in enumerate(processed.images):
+            base_name = generate_filename(self.proc, self.axis_set, idx, not for_web, self.name_hash)
+            if len(processed.images) > 1:
+                version = f"(v{idx+1})-"
+            file_name = f"{filename_prefix}{version}{base_name}"
+            file_path = save_to.joinpath(f"{file_name}.{file_ext}")
+
+            with self.timer.stage("infotext"):
+                info_text = processing.create_infotext(
+                    self.proc, self.proc.all_prompts, self.proc.all_seeds, self.proc.all_subseeds, index=idx
+                )
+            processed.infotexts[idx] = info_text
+
+            with self.timer.stage("save"):
+                moves = write_image(image, file_path, info_text)
+            # thumbnails only need the image, they are made along with the moves
+            thumbnail_path = save_to.parent.joinpath("thumbnails", f"{file_name}.png") if for_web else None
+            self.pending.append((moves, moves[0][1] if moves else file_path, thumbnail_path))
+
+        self.processed = processed
+        return True
+
+    def save(self, save_to: Path, journal: RunJournal | None = None):
+        """move the written images in place, make the thumbnails and verify them, can run in a background thread"""
+        processed = self.processed
+        saved_files: list[str] = []
+        file_path = save_to
+
+        for idx, (moves, file_path, thumbnail_path) in enumerate(self.pending):
+            with self.timer.stage("save"):
+                commit_files(moves)
+            if thumbnail_path is not None:
+                thumbnail_path.parent.mkdir(parents=True, exist_ok=True)
+                with self.timer.stage("thumbnail"):
+                    save_thumbnail(processed.images[idx], thumbnail_path)
+            processed.images[idx] = str(file_path)
+            saved_files.append(file_path.name)
+        self.pending.clear()
+
+        if journal is not None:
+            journal.record(self.cell_id, WRITTEN, files=saved_files)
+            with self.timer.stage("verify"):
+                verified = journal.verify(self.cell_id, save_to)
+            if not verified:
+                logger.error(f"Cell #{self.cell_id} could not be verified after saving.")
+                self.failed = True
+
+        logger.debug("Cell %s saved as %s", args=(self.cell_id, file_path.stem), key="cell_saved")
+
+    def run(
+        self,
+        save_to: Path,
+        overwrite: bool = False,
+        for_web: bool = False,
+        journal: RunJournal | None = None,
+        sizer: BatchSizer | None = None,
+        latents: InitLatentCache | None = None,
+    ):
+        """check, render and save the cell in one go"""
+        with self.timer.stage("skip_check"):
+            is_rendered = not overwrite and self.is_rendered(save_to, journal)
+        if is_rendered:
+            self.skip()
+            return
+        if self.generate(save_to, for_web, journal, sizer, latents):
+            self.save(save_to, journal)
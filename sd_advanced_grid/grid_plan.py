@@ -0,0 +1,233 @@
+# Python
+from __future__ import annotations
+
+import hashlib
+import itertools
+import json
+import math
+import string
+from copy import deepcopy
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+# Local
+from sd_advanced_grid.axis_options import axis_options, find_axis_index
+from sd_advanced_grid.utils import clean_name, logger
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+
+    from sd_advanced_grid.grid_settings import AxisOption
+
+# ################################# Constants ################################ #
+
+CHAR_SET = string.digits + string.ascii_uppercase
+STEP_FIELDS = ["steps", "hr_second_pass_steps"]
+
+# ############################# Helper Functions ############################# #
+
+
+def convert(num: int):
+    """convert a decimal number into an alphanumerical value"""
+    base = len(CHAR_SET)
+    digits = []
+    while num:
+        num, digit = divmod(num, base)
+        digits.append(CHAR_SET[digit])
+    return "".join(reversed(digits)).zfill(2)
+
+
+def file_exist(folder: Path, code: str):
+    files = [path.stem for path in sorted(folder.glob(f"adv_cell-{code}-*.*"))]
+    files = list(filter(lambda file: file.startswith(f"adv_cell-{code}-"), files))
+    return len(files) > 0
+
+
+def grid_folder(outpath: str | Path, grid_name: str) -> Path:
+    return Path(outpath, f"adv_grid_{clean_name(grid_name)}")
+
+
+def is_img2img(proc: Any) -> bool:
+    return bool(getattr(proc, "init_images", None))
+
+
+def build_axes(selection: Iterable[tuple[int | str, Any]], proc: Any = None) -> list[AxisOption]:
+    """
+    create the axes from pairs of axis (position, label or id) and values,
+    "Nothing" axes and empty values are filtered out
+    """
+    axes: list[AxisOption] = []
+    for axis_key, axis_values in selection:
+        if axis_key is None or not axis_values:
+            continue
+        axis_index = find_axis_index(axis_key, img2img=is_img2img(proc))
+        if not axis_index:
+            continue
+        if not isinstance(axis_values, str):
+            axis_values = "||".join(str(value) for value in axis_values)
+        axis = deepcopy(axis_options[axis_index])
+        axes.append(axis.set(axis_values))
+        axis.validate_all(proc=proc)
+        if not axis.is_valid:
+            logger.warn(f"{axis.label} might contain invalid values")
+    return axes
+
+
+def cell_id(indexes: Iterable[int]) -> str:
+    """id of the cell made of the given value index on each axis"""
+    return "".join(convert(index + 1) for index in reversed(list(indexes)))
+
+
+class GridIdentity:
+    """
+    pieces of the cell ids and hashed filenames computed once per grid,
+    a cell is then identified from the value index of each axis without serializing anything
+    """
+
+    def __init__(self, axes: list[AxisOption]):
+        # order in which the axes are applied, the cheapest first
+        self.order = sorted(range(len(axes)), key=lambda position: axes[position].cost)
+        self.codes = [[convert(index + 1) for index in range(axis.length)] for axis in reversed(axes)]
+        # same layout as `json.dumps(axis_set, sort_keys=True, indent=2)`, the last applied axis wins on same ids
+        latest = {axes[position].id: position for position in self.order}
+        self.keyed = [latest[axis_id] for axis_id in sorted(latest)]
+        self.fragments = {
+            position: [
+                json.dumps({axes[position].id: (axes[position].label, value)}, indent=2)[2:-2]
+                for value in axes[position].values
+            ]
+            for position in self.keyed
+        }
+
+    def cell_id(self, indexes: Sequence[int]) -> str:
+        last = len(indexes) - 1
+        return "".join([codes[indexes[last - pos]] for pos, codes in enumerate(self.codes)])
+
+    def digest(self, indexes: Sequence[int]) -> str:
+        """md5 of the axis set, as `generate_filename` computes it"""
+        if not self.keyed:
+            return hashlib.md5(b"{}").hexdigest()
+        body = ",\n".join([self.fragments[position][indexes[position]] for position in self.keyed])
+        return hashlib.md5(f"{{\n{body}\n}}".encode("utf-8")).hexdigest()
+
+
+def iter_cell_indexes(axes: list[AxisOption]) -> Iterator[tuple[int, ...]]:
+    """list the value index of each axis for every cell, in the same order `apply_axes` would produce them"""
+    ordered = sorted(axes, key=lambda axis: axis.cost)
+    positions = [axes.index(axis) for axis in ordered]
+    # the cheapest axis changes the most often, so it goes last in the product
+    for combination in itertools.product(*[range(axis.length) for axis in reversed(ordered)]):
+        indexes = [0] * len(axes)
+        for position, index in zip(reversed(positions), combination):
+            indexes[position] = index
+        yield tuple(indexes)
+
+
+def iter_cell_ids(axes: list[AxisOption]) -> Iterator[str]:
+    """list the cell ids in the same order `apply_axes` would produce them"""
+    return map(GridIdentity(axes).cell_id, iter_cell_indexes(axes))
+
+
+def axis_levels(axis: AxisOption) -> list[int]:
+    """
+    refinement level of each value of an axis: numeric axes start with both ends,
+    other axes with their first value, then the midpoints of each interval are added
+    """
+    levels = [0] * axis.length
+    intervals = [(0, axis.length - 1)]
+    level = 1
+    while intervals:
+        halves = []
+        for low, high in intervals:
+            if high - low < 2:
+                continue
+            middle = (low + high) // 2
+            levels[middle] = level
+            halves += [(low, middle), (middle, high)]
+        intervals = halves
+        level += 1
+    if axis.type not in {int, float}:
+        levels[1:] = [max(level, 1) for level in levels[1:]]
+    return levels
+
+
+def iter_progressive_indexes(axes: list[AxisOption]) -> Iterator[tuple[int, ...]]:
+    """
+    coarse-to-fine order: every cell made of values from the first levels comes first,
+    within a level the cells keep the order of `apply_axes` so expensive axes change as little as possible
+    """
+    levels = [axis_levels(axis) for axis in axes]
+    ordered = sorted(range(len(axes)), key=lambda position: axes[position].cost)
+    positions = ordered[::-1]
+    for level in range(max((max(axis, default=0) for axis in levels), default=0) + 1):
+        pools = [[index for index, value in enumerate(levels[pos]) if value <= level] for pos in positions]
+        for combination in itertools.product(*pools):
+            if level and all(levels[pos][index] < level for pos, index in zip(positions, combination)):
+                continue  # already rendered at a previous level
+            indexes = [0] * len(axes)
+            for position, index in zip(positions, combination):
+                indexes[position] = index
+            yield tuple(indexes)
+
+
+# ################################ Grid Plan ################################# #
+
+
+@dataclass
+class GridPlan:
+    axes: list[AxisOption]
+    cells: int
+    jobs: int
+    steps: int
+    images: int
+
+    @property
+    def invalid(self):
+        return [axis.label for axis in self.axes if not axis.is_valid]
+
+    def existing(self, grid_path: Path) -> int:
+        """count cells already rendered in a grid folder"""
+        folder = grid_path.joinpath("images")
+        if not folder.exists():
+            return 0
+        return sum(1 for code in iter_cell_ids(self.axes) if file_exist(folder, code))
+
+    def summary(self, grid_path: Path | None = None) -> dict[str, Any]:
+        data = {
+            "cells": self.cells,
+            "jobs": self.jobs,
+            "steps": self.steps,
+            "images": self.images,
+            "axes": [axis.dict() for axis in self.axes],
+            "invalid": self.invalid,
+        }
+        if grid_path is not None:
+            data["existing"] = self.existing(grid_path)
+        return data
+
+
+def plan_grid(axes: list[AxisOption], proc: Any) -> GridPlan:
+    """estimate the amount of work required to render a grid (used for dry runs and progress)"""
+    total_steps: list[int] = [proc.steps, 0]
+    if getattr(proc, "enable_hr", False):
+        total_steps[1] = proc.hr_second_pass_steps or proc.steps
+
+    variation = 1
+    for axis in axes:
+        index = STEP_FIELDS.index(axis.id) if axis.id in STEP_FIELDS else None
+        if index is not None:
+            total_steps[index] = sum(axis.values)  # type: ignore
+        else:
+            variation *= axis.length
+
+    cells = math.prod([axis.length for axis in axes])
+    return GridPlan(
+        axes=axes,
+        cells=cells,
+        jobs=cells * (2 if getattr(proc, "enable_hr", False) else 1),
+        steps=sum(total_steps) * variation,
+        images=cells * proc.batch_size,
+    )
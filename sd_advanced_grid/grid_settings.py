@@ -3,13 +3,18 @@ from __future__ import annotations
 
 from dataclasses import KW_ONLY, dataclass
 from dataclasses import field as set_field
-from typing import TYPE_CHECKING
-
-# SD-WebUI
-from modules import sd_models, sd_vae
+from typing import TYPE_CHECKING, Any
 
 # Local
-from sd_advanced_grid.utils import clean_name, get_closest_from_list, logger, parse_range_float, parse_range_int
+from sd_advanced_grid.choices import ChoiceList
+from sd_advanced_grid.utils import (
+    clean_name,
+    get_closest_from_list,
+    logger,
+    parse_range_float,
+    parse_range_int,
+    quantize,
+)
 
 # ################################### Types ################################## #
 
@@ -42,12 +47,14 @@ class AxisOption:
     field: str | None = None
     min: float = 0.0
     max: float = 1.0
-    choices: Callable[..., list[str]] | None = None
+    choices: Callable[..., list[str] | None] | None = None
     toggles: str | None = None
+    mode: str | None = None  # "txt2img" or "img2img" for options specific to one of them
     cost: float = 0.2
     _valid: list[bool] = set_field(init=False, default_factory=list)
     _values: list[str] | list[int] | list[float] | list[bool] = set_field(init=False, default_factory=list)
     _index: int = set_field(init=False, default=0)
+    _handles: dict[Any, Any] | None = set_field(init=False, default=None)
 
     @staticmethod
     def apply_to(field: str, value: AxisOption.type, proc: SD_Proc):
@@ -85,6 +92,12 @@ class AxisOption:
         self._index = 0
         return False
 
+    def select(self, index: int):
+        """jump to a given value (e.g. to render cells out of order)"""
+        if not 0 <= index < self.length:
+            raise RuntimeError(f"No value #{index} for {self.label}")
+        self._index = index
+
     @property
     def id(self):  # pylint: disable=invalid-name
         return self.field if self.field is not None else clean_name(self.label)
@@ -113,6 +126,22 @@ class AxisOption:
     def index(self):
         return self._index
 
+    @property
+    def validity(self) -> list[bool]:
+        """validity of each value, in order"""
+        return self._valid.copy()
+
+    @property
+    def is_value_valid(self) -> bool:
+        """validity of the current value, for values that were not validated it is assumed valid"""
+        return self._index >= len(self._valid) or self._valid[self._index] is not False
+
+    def handle(self, value: Any = None) -> Any:
+        """resolved WebUI object of a value (current one by default), `None` if never resolved"""
+        if self._handles is None:
+            return None
+        return self._handles.get(self.value if value is None else value)
+
     def dict(self):
         return {"label": self.label, "param": self.id, "values": self.values}
 
@@ -132,14 +161,15 @@ class AxisOption:
         self._index = 0
         self._values = list()
         self._valid = list()
+        self._handles = None
 
     def _format_value(self, value: str) -> AxisOption.type:
         cast_value = None
         if self.type == int:
-            cast_value = int(value)
+            cast_value = quantize(value, integer=True)
 
         elif self.type == float:
-            cast_value = round(float(value), 8)
+            cast_value = quantize(value)
 
         elif self.type == bool:
             cast_value = str(value).lower()
@@ -149,8 +179,13 @@ class AxisOption:
                 cast_value = False
 
         elif self.type == str and self.choices is not None:
-            valid_list = self.choices()
-            cast_value = get_closest_from_list(value, valid_list)
+            if isinstance(self.choices, ChoiceList):
+                found = self.choices.closest(value)
+            else:
+                valid_list = self.choices()
+                found = None if valid_list is None else get_closest_from_list(value, valid_list)
+            # keep the value as is when the list cannot be resolved outside of the WebUI
+            cast_value = value if found is None else found
         else:
             cast_value = value
 
@@ -176,7 +211,13 @@ class AxisOption:
         if not same_type:
             raise RuntimeError("Must be a valid type")
 
+    def resolve_all(self) -> dict[Any, Any] | None:
+        """resolve every distinct value at once, empty when there is nothing to resolve"""
+        return {}
+
     def validate_all(self, quiet: bool = True, **_):
+        self._handles = self.resolve_all()
+
         def validation(value):
             try:
                 self.validate(value)
@@ -206,29 +247,6 @@ class AxisNothing(AxisOption):
         return True
 
 
-@dataclass
-class AxisModel(AxisOption):
-    _: KW_ONLY
-    cost: float = 1.0  # change of checkpoints is too heavy, do it less often
-
-    def validate(self, value: str):
-        info = sd_models.get_closet_checkpoint_match(value)
-        if info is None:
-            raise RuntimeError("Unknown checkpoint")
-
-
-@dataclass
-class AxisVae(AxisOption):
-    _: KW_ONLY
-    cost: float = 0.7
-
-    def validate(self, value: str):
-        if value in {"None", "Automatic"}:
-            return
-        if sd_vae.vae_dict.get(value, None) is None:
-            raise RuntimeError("Unknown VAE")
-
-
 @dataclass
 class AxisReplace(AxisOption):
     _: KW_ONLY
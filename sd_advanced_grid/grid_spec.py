@@ -0,0 +1,91 @@
+# Python
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Any
+
+# Local
+from sd_advanced_grid.results import GALLERY_LIMIT
+
+# ################################ Grid Spec ################################# #
+
+
+@dataclass
+class AxisSpec:
+    axis: int | str  # position, label or id of the axis option
+    values: str | list[Any]  # same syntax as the UI, or a list of values
+
+    def pair(self):
+        return self.axis, self.values
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> AxisSpec:
+        if not isinstance(data, dict) or set(data) != {"axis", "values"}:
+            raise RuntimeError(f"Axes are described with `axis` and `values` only, got: {data}")
+        return cls(**data)
+
+
+@dataclass
+class GridSpec:
+    """typed description of a grid, mirrors the options available in the UI"""
+
+    name: str = ""
+    axes: list[AxisSpec] = field(default_factory=list)
+    overwrite: bool = False
+    allow_batches: bool = False
+    dry_run: bool = False
+    force_vae: bool = False
+    for_web: bool = False
+    gallery_limit: int = GALLERY_LIMIT  # images sent back to the UI, every result is in the manifest (0 for all)
+    progressive: bool = False  # render the cells from coarse to fine instead of the odometer order
+    metrics_port: int = 0  # serve the metrics in Prometheus format on localhost (0 to disable)
+    status_port: int = 0  # serve the progress and ETA as JSON and server-sent events on localhost (0 to disable)
+    profile_every: int = 0  # profile every Nth cell (0 to disable)
+    params: dict[str, Any] = field(default_factory=dict)  # processing parameters (headless runs only)
+
+    def selection(self):
+        return [axis.pair() for axis in self.axes]
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> GridSpec:
+        if not isinstance(data, dict):
+            raise RuntimeError(f"A grid is described with a mapping of options, got: {type(data).__name__}")
+        known = {spec_field.name for spec_field in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise RuntimeError(f"Unknown grid options: {', '.join(sorted(unknown))}")
+        options = dict(data)
+        if not isinstance(options.get("params", {}), dict):
+            raise RuntimeError("Grid `params` must be a mapping of processing parameters")
+        axes = options.pop("axes", [])
+        if isinstance(axes, dict):
+            axes = [{"axis": axis, "values": values} for axis, values in axes.items()]
+        if not isinstance(axes, list):
+            raise RuntimeError("Grid `axes` must be a list or a mapping of axes")
+        return cls(**options, axes=[AxisSpec.from_dict(axis) for axis in axes])
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> GridSpec:
+        """load a grid from a JSON or YAML file"""
+        path = Path(path)
+        try:
+            content = path.read_text(encoding="UTF-8")
+        except (OSError, UnicodeDecodeError) as exc:
+            raise RuntimeError(f"Cannot read grid file {path}: {exc}") from exc
+        if path.suffix.lower() in {".yaml", ".yml"}:
+            try:
+                import yaml  # pylint: disable=import-outside-toplevel
+            except ImportError as exc:
+                raise RuntimeError("PyYAML is required to read YAML grid files") from exc
+            try:
+                data = yaml.safe_load(content)
+            except yaml.YAMLError as exc:
+                raise RuntimeError(f"Invalid YAML in {path}: {exc}") from exc
+        else:
+            try:
+                data = json.loads(content)
+            except json.JSONDecodeError as exc:
+                raise RuntimeError(f"Invalid JSON in {path}: {exc}") from exc
+        return cls.from_dict({} if data is None else data)
@@ -0,0 +1,186 @@
+# Python
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+# Local
+from sd_advanced_grid.utils import logger
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+# ################################# Constants ################################ #
+
+JOURNAL_FILE = "journal.jsonl"
+TMP_PREFIX = ".tmp-"  # never matches the `adv_cell-*` pattern used to detect existing cells
+
+PLANNED = "planned"
+STARTED = "started"
+WRITTEN = "written"
+VERIFIED = "verified"
+CELL_PATTERN = "adv_cell-*"  # files of the rendered cells
+
+# ############################# Helper Functions ############################# #
+
+
+def fsync_dir(folder: Path):
+    """persist a rename, not supported on every platform (e.g. Windows)"""
+    try:
+        dir_fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def replace_file(src: Path, dst: Path):
+    """flush a temporary file to disk then move it in place atomically"""
+    with src.open("rb+") as file:
+        os.fsync(file.fileno())
+    os.replace(src, dst)
+    fsync_dir(dst.parent)
+
+
+def atomic_write(path: Path, content: str):
+    tmp_path = path.with_name(f"{TMP_PREFIX}{path.name}")
+    with tmp_path.open(mode="w", encoding="UTF-8") as file:
+        file.write(content)
+    replace_file(tmp_path, path)
+
+
+def verify_image(path: Path) -> bool:
+    """check an image is complete without decoding it entirely"""
+    from PIL import Image, UnidentifiedImageError  # pylint: disable=import-outside-toplevel
+
+    try:
+        if path.stat().st_size == 0:
+            return False
+        with Image.open(path) as image:
+            image.verify()
+    except (OSError, SyntaxError, UnidentifiedImageError):
+        return False
+    return True
+
+
+# ################################ Run Journal ############################### #
+
+
+@dataclass
+class CellEntry:
+    state: str
+    images: int = 1  # number of images expected for the cell (batches)
+    files: list[str] = field(default_factory=list)
+
+
+class RunJournal:
+    """
+    append-only log of the cell state transitions (planned -> started -> written -> verified),
+    each record is flushed to disk so a crash never loses track of a partially rendered cell,
+    records may come from the rendering, look-ahead and writer threads,
+    a journal started along with its grid (`complete`) knows every rendered cell, older grids also rely on their files
+    """
+
+    def __init__(self, grid_path: Path, images_path: Path | None = None):
+        self.path = grid_path.joinpath(JOURNAL_FILE)
+        self.cells: dict[str, CellEntry] = {}
+        self.complete = False
+        self.__broken_line = False
+        self.__lock = threading.Lock()
+        self.__load(images_path)
+
+    def __load(self, images_path: Path | None):
+        if not self.path.exists():
+            if images_path is not None and next(images_path.glob(CELL_PATTERN), None) is None:
+                # nothing rendered yet, the header tells the next runs that no cell was rendered without the journal
+                self.complete = True
+                self.__append([{"complete": True, "time": time.time()}])
+            return
+        with self.path.open(encoding="UTF-8") as file:
+            for line in file:
+                # last line may be truncated after a crash
+                self.__broken_line = not line.endswith("\n")
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self.__update(record)
+
+    def __update(self, record: dict):
+        if "cell" not in record:
+            self.complete = record.get("complete", self.complete)  # header
+            return
+        entry = self.cells.setdefault(record["cell"], CellEntry(record["state"]))
+        entry.state = record["state"]
+        entry.images = record.get("images", entry.images)
+        if "files" in record:
+            entry.files = record["files"]
+
+    def __append(self, records: Iterable[dict]):
+        lines = [json.dumps(record) + "\n" for record in records]
+        if not lines:
+            return
+        if self.__broken_line:
+            lines[0] = "\n" + lines[0]
+            self.__broken_line = False
+        with self.path.open(mode="a", encoding="UTF-8") as file:
+            file.writelines(lines)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def record(self, cell_id: str, state: str, **data):
+        record = {"cell": cell_id, "state": state, "time": time.time(), **data}
+        with self.__lock:
+            self.__append([record])
+            self.__update(record)
+
+    def plan(self, cell_ids: Iterable[str], images: int = 1):
+        """register new cells in a single write"""
+        now = time.time()
+        records = [
+            {"cell": cell_id, "state": PLANNED, "time": now, "images": images}
+            for cell_id in cell_ids
+            if cell_id not in self.cells
+        ]
+        with self.__lock:
+            self.__append(records)
+            for record in records:
+                self.__update(record)
+
+    def verify(self, cell_id: str, folder: Path) -> bool:
+        """check the written files of a cell, mark it as verified when complete"""
+        entry = self.cells.get(cell_id)
+        if entry is None or entry.state not in {WRITTEN, VERIFIED}:
+            return False
+        paths = [folder.joinpath(name) for name in entry.files]
+        if len(paths) < entry.images or not all(verify_image(path) for path in paths):
+            return False
+        if entry.state != VERIFIED:
+            self.record(cell_id, VERIFIED)
+        return True
+
+    def is_done(self, cell_id: str, folder: Path) -> bool | None:
+        """
+        tell if a cell is already rendered based on the journal,
+        `None` means the journal does not know about it (e.g. grid rendered before the journal existed)
+        """
+        entry = self.cells.get(cell_id)
+        if entry is None or entry.state == PLANNED:
+            return False if self.complete else None
+        if entry.state == VERIFIED:
+            return True
+        if entry.state == WRITTEN and self.verify(cell_id, folder):
+            return True
+        logger.warn(f"Cell #{cell_id} is incomplete and will be rendered again.")
+        return False
@@ -0,0 +1,88 @@
+# Python
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any
+
+# SD-WebUI
+from modules import processing, sd_vae, shared
+
+# Local
+from sd_advanced_grid.grid_plan import is_img2img
+from sd_advanced_grid.utils import logger
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from modules.processing import StableDiffusionProcessing as SD_Proc
+
+# ################################# Constants ################################ #
+
+ENCODER = "images_tensor_to_samples"  # VAE encode of the init images (SD-WebUI 1.6+)
+MAX_LATENTS = 8
+
+# ############################ Init Latent Cache ############################# #
+
+
+class InitLatentCache:
+    """
+    encoded init images of img2img cells, shared by the encodes of the same pixels with the same checkpoint,
+    VAE and encode method (e.g. denoising or CFG sweeps), keyed on the tensor itself so the other encodes
+    of a processing (e.g. the conditioning of inpainting models) never get the init latent
+    """
+
+    def __init__(self, limit: int = MAX_LATENTS):
+        self.limit = limit
+        self.hits = 0
+        self.misses = 0
+        self.__latents: OrderedDict[tuple, Any] = OrderedDict()
+
+    @staticmethod
+    def key(image: Any) -> tuple:
+        """pixels of the encoded tensor (cheap next to a VAE encode) and the loaded models"""
+        digest = hashlib.sha1(image.detach().float().cpu().numpy().tobytes()).hexdigest()
+        checkpoint = getattr(shared.sd_model, "sd_checkpoint_info", None)
+        return (
+            digest,
+            tuple(image.shape),
+            str(image.dtype),
+            getattr(checkpoint, "title", None),
+            getattr(sd_vae, "loaded_vae_file", None),
+            getattr(shared.opts, "sd_vae_encode_method", None),
+        )
+
+    @contextmanager
+    def patch(self, proc: SD_Proc) -> Iterator[None]:
+        """serve the encodes of `proc` from the cache while in the context"""
+        original = getattr(processing, ENCODER, None)
+        if original is None or not is_img2img(proc):
+            yield
+            return
+
+        def encode(image, *args, **kwargs):
+            key = self.key(image)
+            latent = self.__latents.get(key)
+            if latent is None:
+                self.misses += 1
+                latent = self.__latents[key] = original(image, *args, **kwargs)
+                if len(self.__latents) > self.limit:
+                    self.__latents.popitem(last=False)
+            else:
+                self.hits += 1
+                self.__latents.move_to_end(key)
+            return latent.clone()
+
+        setattr(processing, ENCODER, encode)
+        try:
+            yield
+        finally:
+            setattr(processing, ENCODER, original)
+
+    def clear(self):
+        if self.hits or self.misses:
+            logger.debug(f"Init latents: {self.hits} reused, {self.misses} encoded")
+        self.__latents.clear()
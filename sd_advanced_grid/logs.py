@@ -0,0 +1,257 @@
+# Python
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from logging.handlers import QueueHandler, QueueListener
+from typing import TYPE_CHECKING, Any, ClassVar
+
+# Lib
+import colorama as c
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from pathlib import Path
+
+# ################################# Constants ################################ #
+
+LOGGER_NAME = "sd_advanced_grid"
+LEVEL_ENV = "SD_ADV_GRID_LOG_LEVEL"  # e.g. "debug", overrides the default level
+GRID_LOG_FILE = "grid.log"
+GRID_JSON_FILE = "grid.log.jsonl"
+RATE_LIMIT = 5  # messages of the same kind (`key`) shown per window, the others are only counted
+RATE_WINDOW = 10.0  # seconds
+
+# ################################## Levels ################################## #
+
+
+@dataclass(frozen=True)
+class LogLevel:
+    name: str
+    severity: int
+    prefix: str
+    color: str
+
+
+LEVELS = {
+    "debug": LogLevel("debug", logging.DEBUG, "[D]", c.Fore.GREEN),
+    "info": LogLevel("info", logging.INFO, "[I]", c.Fore.BLUE),
+    "warning": LogLevel("warning", logging.WARNING, "[W]", c.Fore.MAGENTA),
+    "error": LogLevel("error", logging.ERROR, "[E]", c.Fore.RED),
+    "critical": LogLevel("critical", logging.CRITICAL, "[C]", c.Fore.YELLOW + c.Style.BRIGHT),
+}
+BY_SEVERITY = {level.severity: level for level in LEVELS.values()}
+
+# ################################ Formatters ################################ #
+
+
+def record_dataset(record: logging.LogRecord) -> list[str]:
+    """details of a message, evaluated once and by the writer thread only"""
+    dataset = getattr(record, "dataset", None)
+    if dataset is None:
+        return []
+    if not isinstance(dataset, list):
+        dataset = record.dataset = [str(item) for item in dataset]
+    return dataset
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self, color: bool = False, timestamp: bool = False):
+        super().__init__()
+        self.color = color
+        self.timestamp = timestamp
+
+    def format(self, record: logging.LogRecord) -> str:
+        level = BY_SEVERITY.get(record.levelno, LEVELS["info"])
+        stamp = f"{self.formatTime(record)} " if self.timestamp else ""
+        lines = [f"{stamp}{level.prefix} {record.getMessage()}"]
+        lines += [f" * {sub_msg}" for sub_msg in record_dataset(record)]
+        if not self.color:
+            return "\n".join(lines)
+        return f"\n{level.color}" + "\n".join(lines) + f"\n{c.Style.RESET_ALL}"
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {"time": record.created, "level": record.levelname.lower(), "message": record.getMessage()}
+        if getattr(record, "dataset", None) is not None:
+            entry["dataset"] = record_dataset(record)
+        if getattr(record, "key", None):
+            entry["key"] = record.key
+        return json.dumps(entry, default=str)
+
+
+# ################################# Handlers ################################# #
+
+
+class ConsoleHandler(logging.StreamHandler):
+    """write to the current `sys.stdout`, so redirections made after the setup are honored"""
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    def emit(self, record: logging.LogRecord):
+        self.setStream(sys.stdout)
+        super().emit(record)
+
+
+class LazyQueueHandler(QueueHandler):
+    """queue the records untouched, messages and datasets are formatted by the writer thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class SinkHandler(logging.Handler):
+    """dispatch the records to sinks that can be added or removed while running"""
+
+    def __init__(self):
+        super().__init__()
+        self.sinks: list[logging.Handler] = []
+
+    def emit(self, record: logging.LogRecord):
+        for sink in list(self.sinks):
+            if record.levelno >= sink.level:
+                sink.handle(record)
+
+
+class RateLimiter(logging.Filter):
+    """show a few messages of each kind (records with a `key`) per window, and how many were held back"""
+
+    def __init__(self, limit: int = RATE_LIMIT, window: float = RATE_WINDOW):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.__counts: dict[str, tuple[float, int, int]] = {}  # start of the window, shown, held back
+        self.__lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "key", None)
+        if key is None:
+            return True
+        now = time.monotonic()
+        with self.__lock:
+            start, shown, held = self.__counts.get(key, (now, 0, 0))
+            if now - start > self.window:
+                start, shown = now, 0
+            if shown >= self.limit:
+                self.__counts[key] = (start, shown, held + 1)
+                return False
+            self.__counts[key] = (start, shown + 1, 0)
+        if held:
+            record.msg = f"{record.msg} ({held} similar messages held back)"
+        return True
+
+
+# ################################## Logger ################################## #
+
+
+class Logger:
+    DEBUG: ClassVar = LEVELS["debug"]
+    INFO: ClassVar = LEVELS["info"]
+    WARN: ClassVar = LEVELS["warning"]
+    ERROR: ClassVar = LEVELS["error"]
+    CRITICAL: ClassVar = LEVELS["critical"]
+
+    def __init__(self, level: LogLevel = INFO, *, color: bool = False):
+        self.__logger = logging.getLogger(LOGGER_NAME)
+        self.__logger.propagate = False
+        self.__logger.handlers.clear()
+        self.__sinks = SinkHandler()
+        self.__console = ConsoleHandler()
+        self.__queue: queue.Queue = queue.Queue()
+        handler = LazyQueueHandler(self.__queue)
+        handler.addFilter(RateLimiter())
+        self.__logger.addHandler(handler)
+        self.__json_lines = False
+        self.__listener = QueueListener(self.__queue, self.__sinks)
+        self.__listener.start()
+        atexit.register(self.close)
+        self.configure(level, color=color)
+
+    def configure(
+        self,
+        level: LogLevel | str | None = None,
+        *,
+        color: bool | None = None,
+        console: bool = True,
+        json_lines: bool | None = None,
+    ):
+        """change the level and the sinks, `json_lines` adds a JSON lines log to the next grids"""
+        if isinstance(level, str):
+            level = LEVELS[level.lower()]
+        if level is not None:
+            self.__logger.setLevel(level.severity)
+        if color is not None:
+            c.init(autoreset=False, strip=not color)
+            self.__console.setFormatter(TextFormatter(color=color))
+        if json_lines is not None:
+            self.__json_lines = json_lines
+        if console and self.__console not in self.__sinks.sinks:
+            self.__sinks.sinks.append(self.__console)
+        elif not console and self.__console in self.__sinks.sinks:
+            self.__sinks.sinks.remove(self.__console)
+
+    def is_enabled(self, level: LogLevel) -> bool:
+        return self.__logger.isEnabledFor(level.severity)
+
+    def __log(self, level: LogLevel, msg: str, dataset: Iterable | None, args: tuple, key: str | None):
+        if not self.__logger.isEnabledFor(level.severity):
+            return  # nothing is formatted for disabled levels
+        self.__logger.log(level.severity, msg, *args, extra={"dataset": dataset, "key": key})
+
+    # NOTE: `args` are merged into `msg` (%-style) and `dataset` turned into strings by the writer thread,
+    #       `key` groups messages repeated for each cell so only a few of them are shown
+
+    def debug(self, msg: str, dataset: Iterable | None = None, *, args: tuple = (), key: str | None = None):
+        self.__log(Logger.DEBUG, msg, dataset, args, key)
+
+    def info(self, msg: str, dataset: Iterable | None = None, *, args: tuple = (), key: str | None = None):
+        self.__log(Logger.INFO, msg, dataset, args, key)
+
+    def warn(self, msg: str, dataset: Iterable | None = None, *, args: tuple = (), key: str | None = None):
+        self.__log(Logger.WARN, msg, dataset, args, key)
+
+    def error(self, msg: str, dataset: Iterable | None = None, *, args: tuple = (), key: str | None = None):
+        self.__log(Logger.ERROR, msg, dataset, args, key)
+
+    def flush(self):
+        """wait for the queued messages to be written"""
+        self.__queue.join()
+
+    @contextmanager
+    def grid_sink(self, grid_path: Path) -> Iterator[None]:
+        """copy the messages into the grid folder while in the context"""
+        sinks: list[logging.Handler] = [logging.FileHandler(grid_path.joinpath(GRID_LOG_FILE), encoding="UTF-8")]
+        sinks[0].setFormatter(TextFormatter(timestamp=True))
+        if self.__json_lines:
+            sinks.append(logging.FileHandler(grid_path.joinpath(GRID_JSON_FILE), encoding="UTF-8"))
+            sinks[1].setFormatter(JsonFormatter())
+        self.__sinks.sinks.extend(sinks)
+        try:
+            yield
+        finally:
+            self.flush()
+            for sink in sinks:
+                self.__sinks.sinks.remove(sink)
+                sink.close()
+
+    def close(self):
+        self.__listener.stop()  # writes what is left in the queue
+
+
+def default_level() -> LogLevel:
+    return LEVELS.get(os.environ.get(LEVEL_ENV, "").lower(), Logger.INFO)
+
+
+logger = Logger(default_level(), color=True)
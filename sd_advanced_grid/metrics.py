@@ -0,0 +1,218 @@
+# Python
+from __future__ import annotations
+
+import json
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any
+
+# Local
+from sd_advanced_grid.journal import atomic_write
+from sd_advanced_grid.utils import logger
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+    from pathlib import Path
+
+# ################################# Constants ################################ #
+
+METRICS_FILE = "metrics.jsonl"
+SUMMARY_FILE = "metrics_summary.json"
+PROMETHEUS_FILE = "metrics.prom"
+PROMETHEUS_INTERVAL = 5.0  # seconds between two refresh of the Prometheus file
+PERCENTILES = (50, 90, 99)
+
+# ################################ Local HTTP ################################ #
+
+
+def serve_local(port: int, name: str, routes: dict[str, Callable[[BaseHTTPRequestHandler], None]]):
+    """
+    answer GET requests on localhost from a daemon thread, `routes` map a path to the function writing the response,
+    `None` when the port cannot be used
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):  # pylint: disable=invalid-name
+            route = routes.get(self.path.rstrip("/"))
+            if route is None:
+                self.send_error(404)
+                return
+            route(self)
+
+        def log_message(self, *_):  # keep the console clean
+            return
+
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    except OSError as err:
+        logger.warn(f"Could not serve the grid {name} on port {port}: {err}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f"adv-grid-{name}", daemon=True).start()
+    return server
+
+
+def send_body(handler: BaseHTTPRequestHandler, body: str, content_type: str):
+    data = body.encode("utf-8")
+    handler.send_response(200)
+    handler.send_header("Content-Type", content_type)
+    handler.send_header("Content-Length", str(len(data)))
+    handler.end_headers()
+    handler.wfile.write(data)
+
+
+def stop_server(server: ThreadingHTTPServer | None):
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+
+# ############################### Stage Timer ################################ #
+
+
+class StageTimer:
+    """
+    measure the time spent in each stage of a cell,
+    nested stages are excluded from their parent so the durations add up to the total
+    """
+
+    def __init__(self):
+        self.durations: dict[str, float] = {}
+        self.__children: list[float] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self.__children.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self.__children.pop()
+            self.durations[name] = self.durations.get(name, 0.0) + elapsed - nested
+            if self.__children:
+                self.__children[-1] += elapsed
+
+    @contextmanager
+    def patch(self, owner: Any, attr: str, name: str) -> Iterator[None]:
+        """time every call of `owner.attr` (module function or method) while in the context"""
+        original = getattr(owner, attr, None)
+        if original is None:
+            yield
+            return
+        own_attr = attr in getattr(owner, "__dict__", {})
+
+        def timed(*args, **kwargs):
+            with self.stage(name):
+                return original(*args, **kwargs)
+
+        setattr(owner, attr, timed)
+        try:
+            yield
+        finally:
+            if own_attr:
+                setattr(owner, attr, original)
+            else:
+                delattr(owner, attr)
+
+    @property
+    def total(self):
+        return sum(self.durations.values())
+
+
+# ############################## Grid Metrics ################################ #
+
+
+class GridMetrics:
+    """collect the stage durations of every cell of a grid and export them"""
+
+    def __init__(self, grid_path: Path, port: int = 0):
+        self.grid_path = grid_path
+        self.stages: dict[str, array] = {}
+        self.counts: dict[str, int] = {}
+        self.__lock = threading.Lock()  # the HTTP endpoint reads from another thread
+        self.__file = grid_path.joinpath(METRICS_FILE).open(mode="a", encoding="UTF-8")
+        self.__last_export = 0.0
+        self.__server: ThreadingHTTPServer | None = None
+        if port:
+            self.__server = serve_local(port, "metrics", dict.fromkeys(["", "/metrics"], self.__send))
+            if self.__server is not None:
+                logger.info(f"Serving grid metrics on http://127.0.0.1:{port}/metrics")
+
+    def record(self, cell_id: str, status: str, timer: StageTimer):
+        durations = {name: round(value, 6) for name, value in timer.durations.items()}
+        entry = {"cell": cell_id, "status": status, "time": time.time(), "total": round(timer.total, 6), "stages": durations}
+        self.__file.write(json.dumps(entry) + "\n")
+        self.__file.flush()
+        with self.__lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+            for name, value in timer.durations.items():
+                self.stages.setdefault(name, array("d")).append(value)
+        if time.monotonic() - self.__last_export > PROMETHEUS_INTERVAL:
+            self.export()
+
+    def summary(self) -> dict[str, Any]:
+        with self.__lock:
+            counts = dict(self.counts)
+            all_stages = {name: sorted(values) for name, values in self.stages.items()}
+        grand_total = sum(sum(values) for values in all_stages.values()) or 1.0
+        stages = {}
+        for name, data in all_stages.items():
+            total = sum(data)
+            stages[name] = {
+                "count": len(data),
+                "total": round(total, 3),
+                "share": round(total / grand_total, 4),
+                "mean": round(total / len(data), 6),
+                **{f"p{pct}": round(percentile(data, pct), 6) for pct in PERCENTILES},
+            }
+        return {"cells": counts, "stages": stages}
+
+    def prometheus(self) -> str:
+        summary = self.summary()
+        lines = [
+            "# HELP adv_grid_cells_total Cells handled by status",
+            "# TYPE adv_grid_cells_total counter",
+            *[f'adv_grid_cells_total{{status="{status}"}} {count}' for status, count in summary["cells"].items()],
+            "# HELP adv_grid_stage_seconds Time spent per stage",
+            "# TYPE adv_grid_stage_seconds summary",
+        ]
+        for name, stats in summary["stages"].items():
+            lines += [f'adv_grid_stage_seconds{{stage="{name}",quantile="0.{pct}"}} {stats[f"p{pct}"]}' for pct in PERCENTILES]
+            lines.append(f'adv_grid_stage_seconds_sum{{stage="{name}"}} {stats["total"]}')
+            lines.append(f'adv_grid_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        self.__last_export = time.monotonic()
+        atomic_write(self.grid_path.joinpath(PROMETHEUS_FILE), self.prometheus())
+
+    def __send(self, handler: BaseHTTPRequestHandler):
+        send_body(handler, self.prometheus(), "text/plain; version=0.0.4")
+
+    def close(self):
+        self.__file.close()
+        stop_server(self.__server)
+        summary = self.summary()
+        atomic_write(self.grid_path.joinpath(SUMMARY_FILE), json.dumps(summary, indent=2))
+        self.export()
+        stages = sorted(summary["stages"].items(), key=lambda item: item[1]["total"], reverse=True)
+        logger.info(
+            "Time spent per stage:",
+            [f"{name}: {stats['share']:.1%} (p50 {stats['p50']:.3f}s, p90 {stats['p90']:.3f}s)" for name, stats in stages],
+        )
+
+
+def percentile(data: list[float], pct: int) -> float:
+    """percentile of sorted data, interpolated between the closest ranks"""
+    if not data:
+        return 0.0
+    pos = (len(data) - 1) * pct / 100
+    low = int(pos)
+    high = min(low + 1, len(data) - 1)
+    return data[low] + (data[high] - data[low]) * (pos - low)
@@ -0,0 +1,111 @@
+# Python
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+# SD-WebUI
+from modules import images, shared
+
+# Local
+from sd_advanced_grid.journal import TMP_PREFIX, replace_file
+from sd_advanced_grid.web_assets import THUMBNAIL_SIZE
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+    from modules.processing import StableDiffusionProcessing as SD_Proc
+
+AxisSet = dict[str, tuple[str, Any]]
+
+# ################################# Constants ################################ #
+
+PROB_PATTERNS = ["date", "datetime", "job_timestamp", "batch_number", "generation_number"]
+FILENAME_TOKEN = re.compile(r"(\[([^\[\]<>]+)(?:<.+>|)\])")
+
+# ############################## Image Outputs ############################### #
+
+
+@lru_cache(maxsize=16)
+def stable_pattern(filename_pattern: str) -> str:
+    """remove patterns that may prevent existance detection"""
+    for match in FILENAME_TOKEN.finditer(filename_pattern):
+        pattern, keyword = match.groups()
+        if keyword in PROB_PATTERNS:
+            filename_pattern = filename_pattern\
+                .replace(" " + pattern, "")\
+                .replace("-" + pattern, "")\
+                .replace("_" + pattern, "")\
+                .replace(pattern, "")
+    return filename_pattern
+
+
+def generate_filename(proc: SD_Proc, axis_set: AxisSet, idx = 1, keep_origin: bool = False, digest: str | None = None):
+    """generate a filename for each images based on data to be processed"""
+    file_name = ""
+    if keep_origin:
+        # use pattern defined by the user, `seeds` and `prompts` only hold the last batch when split in several
+        width, height = proc.width, proc.height
+        namegen = images.FilenameGenerator(
+            proc, proc.all_seeds[idx],
+            proc.all_prompts[idx],
+            {
+                "width": width,
+                "height": height
+            }
+        )
+        filename_pattern = stable_pattern(shared.opts.samples_filename_pattern or "[seed]-[prompt_spaces]")
+        file_name = f"{namegen.apply(filename_pattern)}"
+    elif digest is not None:
+        file_name = digest  # same as below, computed once per grid by `GridIdentity`
+    else:
+        # in JS: md5(JSON.stringify(axis_set, Object.keys(axis_set).sort(), 2))
+        encoded = json.dumps(axis_set, sort_keys=True, indent=2).encode("utf-8")
+        dhash = hashlib.md5(encoded)
+        file_name = f"{dhash.hexdigest()}"
+
+    return file_name
+
+
+def write_image(image: Image.Image, file_path: Path, info_text: str) -> list[tuple[Path, Path]]:
+    """
+    save an image through the WebUI under a temporary name, so an interrupted save never looks like a rendered cell,
+    returns the moves from temporary to final names (image first) made by `commit_files`
+    """
+    tmp_path = file_path.with_name(f"{TMP_PREFIX}{file_path.name}")
+    saved_files = images.save_image(
+        image,
+        path=str(tmp_path.parent),
+        basename="",
+        info=info_text,
+        forced_filename=tmp_path.stem,
+        extension=tmp_path.suffix[1:],
+        save_to_dirs=False,
+    )
+    moves: list[tuple[Path, Path]] = []
+    for saved in map(Path, filter(None, saved_files)):  # image and optional infotext file
+        move = (saved, saved.with_name(saved.name[len(TMP_PREFIX):]))
+        # extension may differ (e.g. image too large for the selected format)
+        moves.insert(len(moves) if saved.suffix == ".txt" else 0, move)
+    return moves
+
+
+def commit_files(moves: list[tuple[Path, Path]]) -> list[Path]:
+    """flush the temporary files to disk and move them in place, only file operations (no WebUI state)"""
+    for src, dst in moves:
+        replace_file(src, dst)
+    return [dst for _, dst in moves]
+
+
+def save_thumbnail(image: Image.Image, file_path: Path):
+    tmp_path = file_path.with_name(f"{TMP_PREFIX}{file_path.name}")
+    thumb = image.copy()
+    thumb.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    thumb.save(tmp_path, format=file_path.suffix[1:])
+    replace_file(tmp_path, file_path)
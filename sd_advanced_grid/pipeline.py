@@ -0,0 +1,110 @@
+# Python
+from __future__ import annotations
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, TypeVar
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# ################################# Constants ################################ #
+
+LOOKAHEAD = 4  # items checked ahead of the one being rendered, and saves waiting behind it
+
+# ################################# Look-Ahead ############################### #
+
+
+class _Done:
+    """end of the items, or the error raised by the check"""
+
+    def __init__(self, error: BaseException | None = None):
+        self.error = error
+
+
+def iter_ahead(items: Iterable[T], check: Callable[[T], R], lookahead: int = LOOKAHEAD) -> Iterator[tuple[T, R]]:
+    """
+    pairs of item and `check(item)` in order, the checks run in a worker thread
+    up to `lookahead` items ahead of the consumer (e.g. resume checks while a cell samples)
+    """
+    ready: queue.Queue[tuple[T, R] | _Done] = queue.Queue(maxsize=max(lookahead, 1))
+    stop = threading.Event()
+
+    def put(entry: tuple[T, R] | _Done) -> bool:
+        while not stop.is_set():
+            try:
+                ready.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def work():
+        try:
+            for item in items:
+                if not put((item, check(item))):
+                    return  # the consumer stopped early
+        except BaseException as exc:  # pylint: disable=broad-exception-caught
+            put(_Done(exc))
+            return
+        put(_Done())
+
+    worker = threading.Thread(target=work, name="adv-grid-lookahead", daemon=True)
+    worker.start()
+    try:
+        while True:
+            entry = ready.get()
+            if isinstance(entry, _Done):
+                if entry.error is not None:
+                    raise entry.error
+                return
+            yield entry
+    finally:
+        stop.set()
+        worker.join()
+
+
+# ################################ Background Writer ######################### #
+
+
+class BackgroundWriter:
+    """
+    run tasks one at a time and in order in a worker thread (e.g. saving a cell while the next one samples),
+    submitting waits once `lookahead` tasks are pending so the rendered images cannot pile up in memory
+    """
+
+    def __init__(self, lookahead: int = LOOKAHEAD):
+        self.lookahead = max(lookahead, 1)
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="adv-grid-writer")
+        self.__pending: deque[Future] = deque()
+
+    def submit(self, task: Callable[..., Any], *args: Any) -> None:
+        while self.__pending and self.__pending[0].done():
+            self.__pending.popleft().result()  # raises the errors of the previous tasks
+        if len(self.__pending) >= self.lookahead:
+            self.__pending.popleft().result()
+        self.__pending.append(self.__executor.submit(task, *args))
+
+    def close(self):
+        """wait for the pending tasks, the first error raised by one of them is raised again"""
+        try:
+            while self.__pending:
+                self.__pending.popleft().result()
+        finally:
+            self.__executor.shutdown(wait=True)
+
+    def __enter__(self) -> BackgroundWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.__executor.shutdown(wait=True)  # what was rendered still gets saved, errors aside
@@ -1,104 +1,60 @@
 # Python
-import hashlib
+from __future__ import annotations
+
 import json
 import math
-import re
-import string
+from collections import deque
+from contextlib import ExitStack, closing, contextmanager
 from copy import copy
-from dataclasses import dataclass, field
-from pathlib import Path
-from typing import TYPE_CHECKING, Any
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Callable
 
 # SD-WebUI
-from modules import images, processing, shared
+from modules import processing, shared
 from modules.processing import Processed
 from modules.processing import StableDiffusionProcessingTxt2Img as SD_Proc
 
 # Local
-from sd_advanced_grid.grid_settings import AxisOption
-from sd_advanced_grid.utils import clean_name, logger
+from sd_advanced_grid.batching import LIMITS_FILE, BatchSizer
+from sd_advanced_grid.grid_cell import AxisSet, GridCell
+from sd_advanced_grid.grid_plan import GridIdentity, grid_folder, is_img2img, iter_progressive_indexes
+from sd_advanced_grid.grid_spec import GridSpec
+from sd_advanced_grid.journal import RunJournal, atomic_write
+from sd_advanced_grid.latent_cache import InitLatentCache
+from sd_advanced_grid.metrics import GridMetrics, StageTimer
+from sd_advanced_grid.pipeline import LOOKAHEAD, BackgroundWriter, iter_ahead
+from sd_advanced_grid.profiling import GridProfiler
+from sd_advanced_grid.progress import ProgressTracker
+from sd_advanced_grid.results import GridResults
+from sd_advanced_grid.utils import logger
+from sd_advanced_grid.web_assets import write_web_manifest
 
 # ################################### Types ################################## #
 
 if TYPE_CHECKING:
-    from PIL import Image
-
-AxisSet = dict[str, tuple[str, Any]]
-
-# ################################# Constants ################################ #
+    from collections.abc import Iterator
+    from pathlib import Path
 
-CHAR_SET = string.digits + string.ascii_uppercase
-PROB_PATTERNS = ["date", "datetime", "job_timestamp", "batch_number", "generation_number"]
+    from sd_advanced_grid.grid_settings import AxisOption
 
 # ############################# Helper Functions ############################# #
 
-def convert(num: int):
-    """convert a decimal number into an alphanumerical value"""
-    base = len(CHAR_SET)
-    converted = ""
-    while num:
-        digit = num % base
-        converted += CHAR_SET[digit]
-        num //= base
-    return converted[::-1].zfill(2)
-
-def file_exist(folder: Path, cell_id: str):
-    files = [path.stem for path in sorted(folder.glob(f"adv_cell-{cell_id}-*.*"))]
-    files = list(filter(lambda file: file.startswith(f"adv_cell-{cell_id}-"), files))
-    return len(files) > 0
-
-def generate_filename(proc: SD_Proc, axis_set: AxisSet, idx = 1, keep_origin: bool = False):
-    """generate a filename for each images based on data to be processed"""
-    file_name = ""
-    if keep_origin:
-        # use pattern defined by the user
-        re_pattern = re.compile(r"(\[([^\[\]<>]+)(?:<.+>|)\])")
-        width, height = proc.width, proc.height
-        namegen = images.FilenameGenerator(
-            proc, proc.seeds[idx],
-            proc.prompts[idx],
-            {
-                "width": width,
-                "height": height
-            }
-        )
-        filename_pattern = shared.opts.samples_filename_pattern or "[seed]-[prompt_spaces]"
-        # remove patterns that may prevent existance detection
-        for match in re_pattern.finditer(filename_pattern):
-            pattern, keyword = match.groups()
-            if keyword in PROB_PATTERNS:
-                filename_pattern = filename_pattern\
-                    .replace(" " + pattern, "")\
-                    .replace("-" + pattern, "")\
-                    .replace("_" + pattern, "")\
-                    .replace(pattern, "")
-
-        file_name = f"{namegen.apply(filename_pattern)}"
-    else:
-        # in JS: md5(JSON.stringify(axis_set, Object.keys(axis_set).sort(), 2))
-        encoded = json.dumps(axis_set, sort_keys=True, indent=2).encode("utf-8")
-        dhash = hashlib.md5(encoded)
-        file_name = f"{dhash.hexdigest()}"
-
-    return file_name
-
-
-def apply_axes(set_proc: SD_Proc, axes_settings: list[AxisOption]):
+
+def apply_axes(set_proc: SD_Proc, axes_settings: list[AxisOption], identity: GridIdentity | None = None):
     """
     run through each axis to apply current active values,
     then select next available value on an axis
     """
-    axes = axes_settings.copy()
-    axes.sort(key=lambda axis: axis.cost)  # reorder to avoid heavy changes
+    identity = identity or GridIdentity(axes_settings)
+    indexes = [axis.index for axis in axes_settings]
 
     excs: list[Exception] = []
     axis_set: AxisSet = {}
-    axis_code = ["00"] * len(axes_settings)
     should_iter = True
 
     # self.proc.styles = self.proc.styles[:] # allows for multiple styles axis
-    for axis in axes:
-        axis_code[axes_settings.index(axis)] = convert(axis.index + 1)
+    for position in identity.order:  # reordered to avoid heavy changes
+        axis = axes_settings[position]
         try:
             axis.apply(set_proc)
         except RuntimeError as err:
@@ -107,203 +63,211 @@ def apply_axes(set_proc: SD_Proc, axes_settings: list[AxisOption]):
             axis_set[axis.id] = (axis.label, axis.value)
         if should_iter:
             should_iter = not axis.next()
-    return axis_set, "".join(axis_code[::-1]), excs
+    return axis_set, identity.cell_id(indexes), excs
 
 
-def prepare_jobs(adv_proc: SD_Proc, axes_settings: list[AxisOption], jobs: int, name: str):
-    """create a dedicated processing instance for each variation with different axes values"""
+def skip_axes(axes_settings: list[AxisOption], identity: GridIdentity):
+    """select the next available value on an axis without applying the current ones"""
+    axis_code = identity.cell_id([axis.index for axis in axes_settings])
+    for position in identity.order:
+        if axes_settings[position].next():
+            break
+    return axis_code
+
+
+def prepare_jobs(adv_proc: SD_Proc, axes_settings: list[AxisOption], jobs: int, name: str, progressive=False):
+    """
+    create a dedicated processing instance for each variation with different axes values,
+    progressive grids go through the cells from coarse to fine instead of the odometer order
+    """
 
+    identity = GridIdentity(axes_settings)
+    order = iter_progressive_indexes(axes_settings) if progressive else None
     cells: list[GridCell] = []
     for _ in range(jobs):
-        set_proc = copy(adv_proc)
-        processing.fix_seed(set_proc)
-        set_proc.override_settings = copy(adv_proc.override_settings)
-        set_proc.extra_generation_params = copy(set_proc.extra_generation_params)
-        set_proc.extra_generation_params["Adv. Grid"] = name
-        axis_set, axis_code, errors = apply_axes(set_proc, axes_settings)
+        if order is not None:
+            for axis, index in zip(axes_settings, next(order)):
+                axis.select(index)
+        invalid = [f"Value not valid for {axis.label}: {axis.value}" for axis in axes_settings if not axis.is_value_valid]
+        if invalid:
+            # known to fail, no need to copy the processing
+            axis_code = skip_axes(axes_settings, identity)
+            logger.debug("Detected issues for %s:", invalid, args=(axis_code,), key="cell_issues")
+            continue
+        timer = StageTimer()
+        with timer.stage("prepare"):
+            set_proc = copy(adv_proc)
+            processing.fix_seed(set_proc)
+            set_proc.override_settings = copy(adv_proc.override_settings)
+            set_proc.extra_generation_params = copy(set_proc.extra_generation_params)
+            set_proc.extra_generation_params["Adv. Grid"] = name
+        with timer.stage("apply_axes"):
+            indexes = [axis.index for axis in axes_settings]
+            axis_set, axis_code, errors = apply_axes(set_proc, axes_settings, identity)
         if errors:
-            logger.debug(f"Detected issues for {axis_code}:", errors)
+            logger.debug("Detected issues for %s:", errors, args=(axis_code,), key="cell_issues")
             # TODO: option to break here
             continue
-        cell = GridCell(axis_code, set_proc, axis_set)
+        cell = GridCell(axis_code, set_proc, axis_set, timer, name_hash=identity.digest(indexes))
         cells.append(cell)
 
+    if order is not None and jobs:
+        for axis in axes_settings:
+            axis.select(0)  # same state as after a full odometer cycle
     return cells
 
 
-def combine_processed(processed_result: Processed, processed: Processed):
-    """combine all processed data to allow a single disaply in SD WebUI"""
-    if processed_result.index_of_first_image == 0:
-        # Use our first processed result object as a template container to hold our full results
-        processed_result.images = []
-        processed_result.all_prompts = []
-        processed_result.all_negative_prompts = []
-        processed_result.all_seeds = []
-        processed_result.all_subseeds = []
-        processed_result.infotexts = []
-        processed_result.index_of_first_image = 1
+# ############################ Grid Run Services ############################# #
 
-    if processed.images:
-        # Non-empty list indicates some degree of success.
-        processed_result.images.extend(processed.images)
-        processed_result.all_prompts.extend(processed.all_prompts)
-        processed_result.all_negative_prompts.extend(processed.all_negative_prompts)
-        processed_result.all_seeds.extend(processed.all_seeds)
-        processed_result.all_subseeds.extend(processed.all_subseeds)
-        processed_result.infotexts.extend(processed.infotexts)
 
-    return processed_result
+@dataclass
+class GridServices:
+    """what a grid run keeps open while rendering"""
 
+    spec: GridSpec
+    images_path: Path
+    journal: RunJournal
+    metrics: GridMetrics
+    results: GridResults
+    tracker: ProgressTracker
+    sizer: BatchSizer | None
+    latents: InitLatentCache | None
 
-# ####################### Logic For Individual Variant ####################### #
 
-@dataclass
-class GridCell:
-    # init
-    cell_id: str
-    proc: SD_Proc
-    axis_set: dict[str, tuple[str, Any]]
-    processed: Processed = field(init=False)
-    job_count: int = field(init=False, default=1)
-    skipped: bool = field(init=False, default=False)
-    failed: bool = field(init=False, default=False)
-
-    def __post_init__(self):
-        if self.proc.enable_hr:
-            # NOTE: there might be some extensions that add jobs
-            self.job_count *= 2
-
-    def run(self, save_to: Path, overwrite: bool = False, for_web: bool = False):
-
-
-        total_steps = (self.proc.steps + (
-            (self.proc.hr_second_pass_steps or self.proc.steps) if self.proc.enable_hr else 0
-        )) * self.proc.batch_size
-
-        if file_exist(save_to, self.cell_id) and not overwrite:
-            # pylint: disable=protected-access
-            self.skipped = True
-            if shared.total_tqdm._tqdm:
-                # update console progessbar
-                shared.total_tqdm._tqdm.update(total_steps)
-            shared.state.nextjob()
-            if self.proc.enable_hr:
-                # NOTE: not sure if this is needed or automatic, progressbar update is finicky
-                shared.state.nextjob()
-            logger.debug(f"Skipping cell #{self.cell_id}, file already exist.")
-            return
-
-        logger.info(
-            f"Running image generation for cell {self.cell_id} with the following attributes:",
-            [f"{label}: {value}" for label, value in self.axis_set.values()],
-        )
-
-        # All the magic happens here
-        processed = None
-        try:
-            processed = processing.process_images(self.proc)
-        except RuntimeError:
-            logger.error(f"Skipping cell #{self.cell_id} due to a rendering error.")
-
-        if shared.state.interrupted:
-            return
-
-        if shared.state.skipped:
-            # pylint: disable=protected-access
-            self.skipped = True
-            shared.state.skipped = False
-            if shared.total_tqdm._tqdm:
-                # update console progessbar (to be tested)
-                shared.total_tqdm._tqdm.update(total_steps - shared.state.sampling_step)
-            logger.warn(f"Skipping cell #{self.cell_id}, requested by the system.")
-            return
-
-        if not processed or not processed.images or not any(processed.images):
-            logger.warn(f"No images were generated for cell #{self.cell_id}")
-            self.failed = True
-            return
-        version = ""
-        filename_prefix = f"adv_cell-{self.cell_id}-"
-
-        for idx, image in enumerate(processed.images):
-            base_name = generate_filename(self.proc, self.axis_set, idx, not for_web)
-            if len(processed.images) > 1:
-                version = f"(v{idx+1})-"
-            file_name = f"{filename_prefix}{version}{base_name}"
-            file_ext = shared.opts.samples_format
-            file_path = save_to.joinpath(f"{file_name}.{file_ext}")
-
-            info_text = processing.create_infotext(
-                self.proc, self.proc.all_prompts, self.proc.all_seeds, self.proc.all_subseeds, index=idx
-            )
-            processed.infotexts[idx] = info_text
-
-            images.save_image(
-                image,
-                path=str(file_path.parent),
-                basename="",
-                info=info_text,
-                forced_filename=file_path.stem,
-                extension=file_path.suffix[1:],
-                save_to_dirs=False,
-            )
-            processed.images[idx] = str(file_path)
+def write_config(grid_path: Path, grid_name: str, processed: Processed, axes: list[AxisOption]):
+    grid_path.mkdir(parents=True, exist_ok=True)
+    grid_data = {
+        "name": grid_name,
+        "params": json.loads(processed.js()),
+        "axis": [axis.dict() for axis in axes],
+        # "cells": [{ "id": cell.cell_id, "set": cell.axis_set } for cell in cells] # for testing only
+    }
+    atomic_write(grid_path.joinpath("config.json"), json.dumps(grid_data, indent=2))
 
-            if for_web:
-                # create and save thumbnail
-                file_path = save_to.parent.joinpath("thumbnails", f"{file_name}.png")
-                file_path.parent.mkdir(parents=True, exist_ok=True)
-                thumb = image.copy()
-                thumb.thumbnail((512, 512))
-                thumb.save(file_path)
 
-        self.processed = processed
-        logger.debug(f"Cell {self.cell_id} saved as {file_path.stem}")
+@contextmanager
+def open_services(
+    grid_path: Path, adv_proc: SD_Proc, cells: list[GridCell], batches: int, spec: GridSpec
+) -> Iterator[GridServices]:
+    """
+    start the journal, metrics, progress tracking and caches of a run,
+    whatever the outcome they are closed (ports, files, caches) and the progress tells how the run ended
+    """
+    images_path = grid_path.joinpath("images")
+    state = "failed"
+    with ExitStack() as stack:
+        journal = RunJournal(grid_path, images_path)
+        journal.plan((cell.cell_id for cell in cells), images=adv_proc.batch_size)
+        metrics = GridMetrics(grid_path, port=spec.metrics_port)
+        stack.callback(metrics.close)
+        tracker = ProgressTracker(grid_path, spec.name, cells, port=spec.status_port)
+        stack.callback(lambda: tracker.close(state))
+        latents = InitLatentCache() if is_img2img(adv_proc) else None
+        if latents is not None:
+            stack.callback(latents.clear)
+        sizer = BatchSizer(batches, grid_path.parent.joinpath(LIMITS_FILE)) if batches > 1 else None
+        results = GridResults(grid_path, limit=spec.gallery_limit)
+        yield GridServices(spec, images_path, journal, metrics, results, tracker, sizer, latents)
+        state = "interrupted" if shared.state.interrupted else "done"
+
+
+def render_cells(
+    services: GridServices,
+    cells: list[GridCell],
+    profiler: GridProfiler,
+    callback: Callable[[GridCell], None] | None = None,
+):
+    """
+    render the cells in order, the resume checks run ahead and the saves behind in worker threads,
+    `cells` is emptied so each cell (processing and images) can be freed once handled
+    """
+    spec, images_path, journal, tracker = services.spec, services.images_path, services.journal, services.tracker
+
+    def check(cell: GridCell) -> bool:
+        """resume status, checked ahead in a worker thread while the current cell samples"""
+        with cell.timer.stage("skip_check"):
+            return not spec.overwrite and cell.is_rendered(images_path, journal)
+
+    def complete(position: int, cell: GridCell, interrupted: bool, generated: bool):
+        """save the cell in the background while the next one renders, then account for it"""
+        if generated:
+            with profiler.saving(position, cell.cell_id):
+                cell.save(images_path, journal)
+        status = "interrupted" if interrupted else cell.status
+        services.metrics.record(cell.cell_id, status, cell.timer)
+        tracker.finish(cell, status)
+        if callback is not None:
+            callback(cell)
+        if not interrupted:
+            services.results.add(cell)
+
+    total = len(cells)
+    pending = deque(cells)
+    cells.clear()
+    cells_ahead = iter_ahead((pending.popleft() for _ in range(total)), check, LOOKAHEAD)
+    with BackgroundWriter(LOOKAHEAD) as writer, closing(cells_ahead):
+        for i, (cell, is_rendered) in enumerate(cells_ahead):
+            job_info = f"Generating variant #{i + 1} out of {total} - "
+            shared.state.textinfo = job_info  # type: ignore
+            shared.state.job = job_info  # seems to be unused
+            tracker.start(cell)
+            generated = False
+            if is_rendered:
+                cell.skip()  # never reaches the rendering
+            else:
+                with profiler.cell(i, cell.cell_id):
+                    generated = cell.generate(images_path, spec.for_web, journal, services.sizer, services.latents)
+                    with cell.timer.stage("close"):
+                        cell.proc.close()
+            interrupted = bool(shared.state.interrupted)
+            writer.submit(complete, i, cell, interrupted, generated)
+            if interrupted:
+                logger.warn("Process interupted. Cancelling all jobs.")
+                break
 
 
 # ########################## Generation Entry Point ########################## #
 
-def generate_grid(adv_proc: SD_Proc, grid_name: str, overwrite: bool, batches: int, test: bool, axes: list[AxisOption], for_web=False):
-    grid_path = Path(adv_proc.outpath_grids, f"adv_grid_{clean_name(grid_name)}")
-
+def generate_grid(
+    adv_proc: SD_Proc,
+    grid_name: str,
+    overwrite: bool,
+    batches: int,
+    test: bool,
+    axes: list[AxisOption],
+    for_web=False,
+    *,
+    spec: GridSpec | None = None,
+    callback: Callable[[GridCell], None] | None = None,
+):
+    """render the grid, the other options of the run (ports, profiling, order, gallery) come from `spec`"""
+    spec = replace(spec or GridSpec(), name=grid_name, overwrite=overwrite, dry_run=test, for_web=for_web)
+    grid_path = grid_folder(adv_proc.outpath_grids, grid_name)
     processed = Processed(adv_proc, [], adv_proc.seed, "", adv_proc.subseed)
 
-    aprox_jobs = math.prod([axis.length for axis in axes])
-    cells = prepare_jobs(adv_proc, axes, aprox_jobs, grid_name)
+    with closing(GridProfiler(grid_path, every=spec.profile_every)) as profiler:
+        aprox_jobs = math.prod([axis.length for axis in axes])
+        with profiler.planning():
+            cells = prepare_jobs(adv_proc, axes, aprox_jobs, grid_name, progressive=spec.progressive)
+        write_config(grid_path, grid_name, processed, axes)
+        if test:
+            return processed
 
-    grid_path.mkdir(parents=True, exist_ok=True)
-    grid_data = {
-        "name": grid_name,
-        "params": json.loads(processed.js()),
-        "axis": [axis.dict() for axis in axes],
-        # "cells": [{ "id": cell.cell_id, "set": cell.axis_set } for cell in cells] # for testing only
-    }
+        with logger.grid_sink(grid_path), open_services(grid_path, adv_proc, cells, batches, spec) as services:
+            shared.state.job_count = sum((cell.job_count for cell in cells), start=0)
+            shared.state.processing_has_refined_job_count = True
+            # the plan also counts the invalid cells
+            shared.total_tqdm.updateTotal(services.tracker.remaining_steps)
 
-    with grid_path.joinpath("config.json").open(mode="w", encoding="UTF-8") as file:
-        file.write(json.dumps(grid_data, indent=2))
-
-    if test:
-        return processed
-
-    shared.state.job_count = sum((cell.job_count for cell in cells), start=0)
-    shared.state.processing_has_refined_job_count = True
-
-    if batches == 1:
-        logger.info(f"Starting generation of {len(cells)} variants")
-    else:
-        logger.info(
-            f"Starting generation of {len(cells)} variants (batch x{batches})")
-
-    for i, cell in enumerate(cells):
-        job_info = f"Generating variant #{i + 1} out of {len(cells)} - "
-        shared.state.textinfo = job_info  # type: ignore
-        shared.state.job = job_info  # seems to be unused
-        cell.run(save_to=grid_path.joinpath("images"), overwrite=overwrite, for_web=for_web)
-        cell.proc.close()
-        if shared.state.interrupted:
-            logger.warn("Process interupted. Cancelling all jobs.")
-            break
-        if not cell.skipped and not cell.failed:
-            combine_processed(processed, cell.processed)
+            if batches == 1:
+                logger.info(f"Starting generation of {len(cells)} variants")
+            else:
+                logger.info(
+                    f"Starting generation of {len(cells)} variants (batch x{batches})")
 
-    return processed
+            render_cells(services, cells, profiler, callback)
+
+            if for_web:
+                write_web_manifest(grid_path)
+            logger.info(services.results.summary())
+            return services.results.fill(processed)
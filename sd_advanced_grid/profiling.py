@@ -0,0 +1,124 @@
+# Python
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+# Local
+from sd_advanced_grid.utils import logger
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+# ################################# Constants ################################ #
+
+PROFILE_FOLDER = "profile"
+MEMORY_FILE = "memory.txt"
+PROFILE_EVERY = 10  # default cell interval when enabled from the UI
+TOP_STATS = 25
+
+# ################################# Profiler ################################# #
+
+
+class GridProfiler:
+    """
+    opt-in profiling of a grid run: cProfile for the planning and every Nth cell,
+    tracemalloc snapshots between those cells to find what keeps growing
+    """
+
+    def __init__(self, grid_path: Path, every: int = 0):
+        self.folder = grid_path.joinpath(PROFILE_FOLDER)
+        self.every = every
+        self.__snapshot: tracemalloc.Snapshot | None = None
+        self.__owns_tracemalloc = False
+
+    @property
+    def enabled(self):
+        return self.every > 0
+
+    def __start(self):
+        self.folder.mkdir(parents=True, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.__owns_tracemalloc = True
+        self.__snapshot = self.__take_snapshot()
+        logger.info(f"Profiling every {self.every} cells into {self.folder}")
+
+    @staticmethod
+    def __take_snapshot():
+        return tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            ]
+        )
+
+    @contextmanager
+    def __profile(self, name: str) -> Iterator[None]:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # another profiler is already active (e.g. running under a profiler)
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(self.folder.joinpath(f"{name}.prof"))
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(TOP_STATS)
+            self.folder.joinpath(f"{name}.txt").write_text(stream.getvalue(), encoding="UTF-8")
+
+    @contextmanager
+    def planning(self) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        self.__start()
+        with self.__profile("planning"):
+            yield
+        self.__memory_diff("planning")
+
+    @contextmanager
+    def cell(self, position: int, cell_id: str) -> Iterator[None]:
+        if not self.enabled or position % self.every:
+            yield
+            return
+        with self.__profile(f"cell-{cell_id}"):
+            yield
+        self.__memory_diff(f"cell #{cell_id} ({position + 1})")
+
+    @contextmanager
+    def saving(self, position: int, cell_id: str) -> Iterator[None]:
+        """profile the saving of a profiled cell, it runs in the writer thread so `cell` cannot see it"""
+        if not self.enabled or position % self.every:
+            yield
+            return
+        with self.__profile(f"cell-{cell_id}-save"):
+            yield
+
+    def __memory_diff(self, label: str):
+        snapshot = self.__take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"## After {label}: current {current / 2**20:.1f} MiB, peak {peak / 2**20:.1f} MiB"]
+        if self.__snapshot is not None:
+            lines += [str(stat) for stat in snapshot.compare_to(self.__snapshot, "lineno")[:TOP_STATS]]
+        self.__snapshot = snapshot
+        with self.folder.joinpath(MEMORY_FILE).open(mode="a", encoding="UTF-8") as file:
+            file.write("\n".join(lines) + "\n\n")
+
+    def close(self):
+        if self.__owns_tracemalloc:
+            tracemalloc.stop()
+            self.__owns_tracemalloc = False
+        self.__snapshot = None
@@ -0,0 +1,205 @@
+# Python
+from __future__ import annotations
+
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any
+
+# Local
+from sd_advanced_grid.batching import batch_class
+from sd_advanced_grid.journal import atomic_write
+from sd_advanced_grid.metrics import send_body, serve_local, stop_server
+from sd_advanced_grid.utils import logger
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from pathlib import Path
+
+    from sd_advanced_grid.grid_cell import GridCell
+
+# ################################# Constants ################################ #
+
+STATUS_FILE = "status.json"
+STATUS_INTERVAL = 1.0  # seconds between two writes of the status file
+EWMA_ALPHA = 0.3  # weight of the last cell in the measured throughput
+SSE_TIMEOUT = 15.0  # seconds between two events when nothing changes (keeps the connection alive)
+
+# ############################# Helper Functions ############################# #
+
+
+def cell_steps(proc: Any) -> int:
+    """sampling steps of a cell, hires pass and batch included"""
+    steps = proc.steps
+    if getattr(proc, "enable_hr", False):
+        steps += proc.hr_second_pass_steps or proc.steps
+    return steps * proc.batch_size
+
+
+# ################################ Step Rates ################################ #
+
+
+class StepRates:
+    """
+    steps left and measured seconds per step for each class of cells (see `batch_class`),
+    the rates are an EWMA of the time each cell added to the grid, not thread safe on its own
+    """
+
+    def __init__(self):
+        self.rates: dict[str, float] = {}  # seconds per step, by class
+        self.pending: dict[str, int] = {}  # steps left, by class
+        self.cells: dict[str, tuple[str, int]] = {}  # class and steps of the cells left, by id
+        self.starts: dict[str, float] = {}
+        self.last_finish = 0.0
+
+    def add(self, cell: GridCell):
+        key, steps = batch_class(cell.proc), cell_steps(cell.proc)
+        self.cells[cell.cell_id] = (key, steps)
+        self.pending[key] = self.pending.get(key, 0) + steps
+
+    @property
+    def remaining(self) -> int:
+        return sum(self.pending.values())
+
+    def eta(self) -> float | None:
+        """seconds left, classes not measured yet use the mean rate of the others"""
+        if not self.rates:
+            return None if self.remaining else 0.0
+        fallback = sum(self.rates.values()) / len(self.rates)
+        return sum((steps * self.rates.get(key, fallback) for key, steps in self.pending.items()), start=0.0)
+
+    def start(self, cell_id: str):
+        self.starts[cell_id] = time.monotonic()
+
+    def finish(self, cell_id: str, done: bool) -> int:
+        """account for a cell leaving the grid, returns its steps when it was rendered"""
+        now = time.monotonic()
+        # time the cell added to the grid, the saving of a cell overlaps the rendering of the next one
+        elapsed = now - max(self.starts.pop(cell_id, now), self.last_finish)
+        self.last_finish = now
+        key, steps = self.cells.pop(cell_id, (None, 0))
+        if key is None:
+            return 0
+        self.pending[key] -= steps
+        if not self.pending[key]:
+            del self.pending[key]
+        if not done or not steps:
+            return 0
+        rate = elapsed / steps
+        previous = self.rates.get(key)
+        self.rates[key] = rate if previous is None else EWMA_ALPHA * rate + (1 - EWMA_ALPHA) * previous
+        return steps
+
+
+# ############################# Progress Tracker ############################# #
+
+
+class ProgressTracker:
+    """follow the cells of a grid and estimate the time left from the measured throughput (see `StepRates`)"""
+
+    def __init__(self, grid_path: Path, name: str, cells: Iterable[GridCell], port: int = 0):
+        self.grid_path = grid_path
+        self.name = name
+        self.state = "running"
+        self.planned = 0
+        self.counts = {"done": 0, "skipped": 0, "failed": 0}
+        self.steps_done = 0
+        self.current: str | None = None
+        self.steps = StepRates()
+        for cell in cells:
+            self.planned += 1
+            self.steps.add(cell)
+        self.__started = time.time()
+        self.__last_write = 0.0
+        self.__version = 0
+        self.__changed = threading.Condition()  # the HTTP endpoint reads from other threads
+        self.__server: ThreadingHTTPServer | None = None
+        if port:
+            routes = {"": self.__send_status, "/status": self.__send_status, "/events": self.__send_events}
+            self.__server = serve_local(port, "status", routes)
+            if self.__server is not None:
+                logger.info(f"Serving grid status on http://127.0.0.1:{port}/status (events on /events)")
+        self.publish(force=True)
+
+    @property
+    def remaining_steps(self) -> int:
+        return self.steps.remaining
+
+    def eta(self) -> float | None:
+        return self.steps.eta()
+
+    def start(self, cell: GridCell):
+        with self.__changed:
+            self.current = cell.cell_id
+            self.steps.start(cell.cell_id)
+
+    def finish(self, cell: GridCell, status: str):
+        with self.__changed:
+            self.steps_done += self.steps.finish(cell.cell_id, status == "done")
+            self.counts[status] = self.counts.get(status, 0) + 1
+            if self.current == cell.cell_id:
+                self.current = None
+        self.publish()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self.__changed:
+            eta = self.eta()
+            handled = sum(self.counts.values())
+            return {
+                "name": self.name,
+                "state": self.state,
+                "cells": {"planned": self.planned, **self.counts, "remaining": self.planned - handled},
+                "steps": {"done": self.steps_done, "remaining": self.remaining_steps},
+                "current": self.current,
+                "elapsed": round(time.time() - self.__started, 3),
+                "eta": None if eta is None else round(eta, 3),
+                "eta_at": None if eta is None else datetime.fromtimestamp(time.time() + eta, timezone.utc).isoformat(),
+                "rates": {key: round(rate, 6) for key, rate in self.steps.rates.items()},
+                "updated": datetime.now(timezone.utc).isoformat(),
+            }
+
+    def publish(self, force: bool = False):
+        """notify the listeners, the status file is only written every STATUS_INTERVAL"""
+        with self.__changed:
+            self.__version += 1
+            self.__changed.notify_all()
+        if force or time.monotonic() - self.__last_write > STATUS_INTERVAL:
+            self.__last_write = time.monotonic()
+            atomic_write(self.grid_path.joinpath(STATUS_FILE), json.dumps(self.snapshot(), indent=2))
+
+    def wait(self, version: int) -> int:
+        """block until the next change (or SSE_TIMEOUT), returns the version of the status"""
+        with self.__changed:
+            self.__changed.wait_for(lambda: self.__version != version or self.state != "running", SSE_TIMEOUT)
+            return self.__version
+
+    def __send_status(self, handler: BaseHTTPRequestHandler):
+        send_body(handler, json.dumps(self.snapshot()), "application/json")
+
+    def __send_events(self, handler: BaseHTTPRequestHandler):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+        version = -1
+        try:
+            while True:
+                version = self.wait(version)
+                snapshot = self.snapshot()
+                handler.wfile.write(f"data: {json.dumps(snapshot)}\n\n".encode("utf-8"))
+                handler.wfile.flush()
+                if snapshot["state"] != "running":
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client gone
+
+    def close(self, state: str = "done"):
+        with self.__changed:
+            self.state = state
+            self.current = None
+        self.publish(force=True)
+        stop_server(self.__server)
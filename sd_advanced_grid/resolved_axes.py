@@ -0,0 +1,63 @@
+# Python
+from __future__ import annotations
+
+from dataclasses import KW_ONLY, dataclass
+from typing import TYPE_CHECKING
+
+# Local
+from sd_advanced_grid.choices import checkpoint_handles, sampler_handles, vae_handles
+from sd_advanced_grid.grid_settings import AxisOption
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from modules.processing import StableDiffusionProcessing as SD_Proc
+
+# ############################## Resolved Axes ############################### #
+# values of these axes are resolved to WebUI objects at once when validated, kept as handles
+
+
+@dataclass
+class AxisModel(AxisOption):
+    _: KW_ONLY
+    cost: float = 1.0  # change of checkpoints is too heavy, do it less often
+
+    def resolve_all(self):
+        return checkpoint_handles.resolve_all(self._values)
+
+    def _apply(self, proc: SD_Proc):
+        # use the resolved title so the WebUI finds it without searching again
+        info = self.handle()
+        AxisOption.apply_to(self.id, info.title if info is not None else self.value, proc)
+
+    def validate(self, value: str):
+        if self._handles is None:
+            return  # can only be checked within the WebUI
+        if self._handles.get(value) is None:
+            raise RuntimeError("Unknown checkpoint")
+
+
+@dataclass
+class AxisVae(AxisOption):
+    _: KW_ONLY
+    cost: float = 0.7
+
+    def resolve_all(self):
+        return vae_handles.resolve_all(self._values)
+
+    def validate(self, value: str):
+        if self._handles is None:
+            return  # can only be checked within the WebUI
+        if self._handles.get(value) is None:
+            raise RuntimeError("Unknown VAE")
+
+
+@dataclass
+class AxisSampler(AxisOption):
+    def resolve_all(self):
+        return sampler_handles.resolve_all(self._values)
+
+    def validate(self, value: str):
+        super().validate(value)
+        if self._handles is not None and self._handles.get(value) is None:
+            raise RuntimeError("Unknown sampler")
@@ -0,0 +1,112 @@
+# Python
+from __future__ import annotations
+
+import json
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from modules.processing import Processed
+
+    from sd_advanced_grid.grid_cell import GridCell
+
+# ################################# Constants ################################ #
+
+MANIFEST_FILE = "manifest.jsonl"
+GALLERY_LIMIT = 100  # images returned to the WebUI gallery, the manifest lists all of them
+RESULT_FIELDS = ["images", "all_prompts", "all_negative_prompts", "all_seeds", "all_subseeds", "infotexts"]
+
+# ############################# Helper Functions ############################# #
+
+
+def read_manifest(grid_path: Path) -> dict[str, dict[str, Any]]:
+    """entries of a grid by cell id, the last entry of a cell wins (e.g. overwritten cells)"""
+    manifest: dict[str, dict[str, Any]] = {}
+    path = grid_path.joinpath(MANIFEST_FILE)
+    if not path.exists():
+        return manifest
+    with path.open(encoding="UTF-8") as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # truncated by a crash
+            manifest[entry["id"]] = entry
+    return manifest
+
+
+# ############################## Result Stream ############################### #
+
+
+@dataclass
+class GridResults:
+    """
+    stream the results of each cell into the manifest as soon as they are written,
+    only a bounded sample of images is kept for the WebUI gallery
+    """
+
+    grid_path: Path
+    limit: int = GALLERY_LIMIT  # 0 to keep every image
+    done: int = field(init=False, default=0)
+    skipped: int = field(init=False, default=0)
+    failed: int = field(init=False, default=0)
+    _seen: int = field(init=False, default=0)
+    _sample: list[tuple[int, tuple]] = field(init=False, default_factory=list)
+    _random: random.Random = field(init=False, default_factory=lambda: random.Random(0))
+
+    def add(self, cell: GridCell):
+        if cell.skipped:
+            self.skipped += 1
+            return
+        if cell.failed:
+            self.failed += 1
+            return
+        self.done += 1
+        processed = cell.processed
+        paths = [str(image) for image in processed.images]
+        entry = {
+            "id": cell.cell_id,
+            "axes": {axis_id: value for axis_id, (_, value) in cell.axis_set.items()},
+            "files": [Path(path).name for path in paths],  # inside the `images` folder
+            "prompts": processed.all_prompts,
+            "negative_prompts": processed.all_negative_prompts,
+            "seeds": processed.all_seeds,
+            "subseeds": processed.all_subseeds,
+            "infotexts": processed.infotexts,
+        }
+        with self.grid_path.joinpath(MANIFEST_FILE).open(mode="a", encoding="UTF-8") as file:
+            file.write(json.dumps(entry) + "\n")
+        for idx, path in enumerate(paths):
+            self.__keep(path, entry, idx)
+
+    def __keep(self, path: str, entry: dict[str, Any], idx: int):
+        """reservoir sampling, every image has the same chance to be shown whatever the grid size"""
+        keys = ["prompts", "negative_prompts", "seeds", "subseeds", "infotexts"]
+        image = (path, *(entry[key][idx] if idx < len(entry[key]) else None for key in keys))
+        position = self._seen
+        self._seen += 1
+        if not self.limit or len(self._sample) < self.limit:
+            self._sample.append((position, image))
+            return
+        slot = self._random.randrange(self._seen)
+        if slot < self.limit:
+            self._sample[slot] = (position, image)
+
+    def summary(self):
+        shown = f"{len(self._sample)} of {self._seen} images shown" if self._seen > len(self._sample) else ""
+        counts = f"{self.done} cells rendered, {self.skipped} skipped, {self.failed} failed"
+        return f"{counts}. {shown}, see {MANIFEST_FILE} for all results." if shown else f"{counts}."
+
+    def fill(self, processed: Processed) -> Processed:
+        """hand the sampled images over to the WebUI, in rendering order"""
+        if self._sample:
+            processed.index_of_first_image = 1
+        columns = list(zip(*(image for _, image in sorted(self._sample, key=lambda item: item[0]))))
+        for name, column in zip(RESULT_FIELDS, columns or [()] * len(RESULT_FIELDS)):
+            setattr(processed, name, list(column))
+        processed.comments = self.summary()
+        return processed
@@ -1,6 +1,4 @@
 # Python
-from copy import copy, deepcopy
-from datetime import datetime
 from typing import Any
 
 # Lib
@@ -8,54 +6,41 @@ import gradio as gr
 from typing_extensions import Unpack
 
 # SD-WebUI
-from modules import processing, scripts, sd_models, sd_vae, shared
+from modules import scripts
 from modules.processing import Processed
 from modules.processing import StableDiffusionProcessingTxt2Img as SD_Proc
-from modules.shared import opts
 from modules.ui_components import ToolButton
-from sd_advanced_grid.axis_options import axis_options
-from sd_advanced_grid.grid_settings import SHARED_OPTS, AxisOption
-from sd_advanced_grid.process_axes import generate_grid
 
 # Local
-from sd_advanced_grid.utils import logger
+from sd_advanced_grid.api import GridRun
+from sd_advanced_grid.axis_options import axis_options, find_axis_index, is_available
+from sd_advanced_grid.grid_spec import AxisSpec, GridSpec
+from sd_advanced_grid.profiling import PROFILE_EVERY
 
 # ################################# Constants ################################ #
 
 REFRESH_SYMBOL = "\U0001f504"  # 🔄
 FILL_SYMBOL = "\U0001f4d2"  # 📒
-STEP_FIELDS = ["steps", "hr_second_pass_steps"]
 MIN_AXES = 4
 MAX_AXES = 10
 TEXT_PLACEHOLDER = ["Select a type", "Enter values"]
 
-# ################################## Helpers ################################# #
-
-
-class SharedOptionsCache:
-    def __enter__(self):
-        for key in SHARED_OPTS:
-            setattr(self, key, getattr(opts, key, None))
+# ########################## Gradio Event Functions ########################## #
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        for key in SHARED_OPTS:
-            setattr(opts, key, getattr(self, key))
-        sd_models.reload_model_weights()
-        sd_vae.reload_vae_weights()
 
+# NOTE: axes are selected by label, the options differ between txt2img and img2img (`None` for both)
 
-# ########################## Gradio Event Functions ########################## #
 
-
-def fill_axis(axis_index: int):
-    axis = axis_options[axis_index]
+def fill_axis(axis_label: str, img2img: bool | None = None):
+    axis = axis_options[find_axis_index(axis_label, img2img)]
     if axis.choices is not None:
         return axis.choices()
     return gr.update()
 
 
-def update_input(axis_index: int):
+def update_input(axis_label: str, img2img: bool | None = None):
     # TODO: set an input mode system (link or not to axis.type)
+    axis_index = find_axis_index(axis_label, img2img)
     has_type = axis_index > 0
     axis_type = axis_options[axis_index]
     has_choices = False
@@ -79,11 +64,11 @@ def update_input(axis_index: int):
     ]
 
 
-def populate_input(axis_index, values: list[str]):
+def populate_input(axis_label: str, values: list[str], img2img: bool | None = None):
     """Update the main input (Textbox) to rely on a single source"""
-    axis_type = axis_options[axis_index]
+    axis_type = axis_options[find_axis_index(axis_label, img2img)]
     if axis_type.choices is not None:
-        choices = axis_type.choices()
+        choices = set(axis_type.choices())
         values = list(filter(lambda x: x in choices, values))
     return ", ".join(values)
 
@@ -122,10 +107,10 @@ class ScriptGrid(scripts.Script):
     def title(self):
         return "Advanced Grid"
 
-    def show(self, is_img2img: bool):
-        return not is_img2img
+    def show(self, _):
+        return True
 
-    def ui(self, _):  # pylint: disable=invalid-name
+    def ui(self, is_img2img: bool):  # pylint: disable=invalid-name
         axes_ctrl: list[gr.components.Component] = []
         axes_selection: list[gr.components.Component] = []
 
@@ -134,9 +119,8 @@ class ScriptGrid(scripts.Script):
                 row_visibility = gr.Checkbox(value=axis_count <= MIN_AXES, visible=False)
                 row_type = gr.Dropdown(
                     label=f"Axis {axis_count} Type",
-                    choices=[axis.label for axis in axis_options],
+                    choices=[axis.label for axis in axis_options if is_available(axis, is_img2img)],
                     value=axis_options[0].label,
-                    type="index",
                 )
                 row_value = gr.Textbox(
                     label=f"Axis {axis_count} Values", interactive=False, lines=1, placeholder=TEXT_PLACEHOLDER[0]
@@ -151,13 +135,20 @@ class ScriptGrid(scripts.Script):
                 # e.g. numbers: from, to, and steps or increment
                 #      AxisReplace: Texbox with a token system (need new Gradio component)
             row_visibility.change(update_axis, inputs=[row_visibility], outputs=[axis_row, row_type])  # type: ignore
+            # the options are looked up among the ones of the tab
             row_type.change(
-                update_input, inputs=[row_type], outputs=[row_value, row_value_list, row_value_bool, fill_row_button]
+                lambda label: update_input(label, is_img2img),
+                inputs=[row_type],
+                outputs=[row_value, row_value_list, row_value_bool, fill_row_button],
             )
-            row_value_list.input(populate_input, inputs=[row_type, row_value_list], outputs=[row_value])
-            row_value_bool.input(populate_input, inputs=[row_type, row_value_bool], outputs=[row_value])
-            fill_row_button.click(fill_axis, inputs=[row_type], outputs=[row_value_list]) \
-                .then(populate_input, inputs=[row_type, row_value_list], outputs=[row_value])
+
+            def populate(label: str, values: list[str]):
+                return populate_input(label, values, is_img2img)
+
+            row_value_list.input(populate, inputs=[row_type, row_value_list], outputs=[row_value])
+            row_value_bool.input(populate, inputs=[row_type, row_value_bool], outputs=[row_value])
+            fill_row_button.click(lambda label: fill_axis(label, is_img2img), inputs=[row_type], outputs=[row_value_list]) \
+                .then(populate, inputs=[row_type, row_value_list], outputs=[row_value])
             axes_selection.extend([row_type, row_value])
             return row_visibility
 
@@ -196,6 +187,16 @@ class ScriptGrid(scripts.Script):
                     label="For Web",
                     info="Create Web Interface",
                 )
+                profile = gr.Checkbox(
+                    value=False,
+                    label="Profile",
+                    info=f"Profile planning and every {PROFILE_EVERY}th cell (slower)",
+                )
+                progressive = gr.Checkbox(
+                    value=False,
+                    label="Progressive",
+                    info="Render an overview first (ends and midpoints), then refine",
+                )
                 # fixed seed option?
 
         # fmt: off
@@ -208,7 +209,7 @@ class ScriptGrid(scripts.Script):
         add_button.click(lambda nb: nb + 1, inputs=[nb_axes], outputs=[nb_axes])
         del_button.click(lambda nb: nb - 1, inputs=[nb_axes], outputs=[nb_axes])
 
-        return [grid_name, do_overwrite, allow_batches, test_run, force_vae, for_web] + axes_selection
+        return [grid_name, do_overwrite, allow_batches, test_run, force_vae, for_web, profile, progressive] + axes_selection
 
     def run(
         self,
@@ -219,58 +220,19 @@ class ScriptGrid(scripts.Script):
         test_run: bool,
         force_vae: bool,
         for_web: bool,
+        profile: bool,
+        progressive: bool,
         *axes_selection: Unpack[tuple[Any, ...]],
     ) -> Processed:
-        if not grid_name:
-            grid_name = f"{datetime.now().strftime('%d_%m_%Y_%H_%M_%S')}"
-
-        # Clean up default params
-        adv_proc = copy(sd_processing)
-        processing.fix_seed(adv_proc)
-        adv_proc.override_settings_restore_afterwards = False
-        adv_proc.n_iter = 1
-        adv_proc.do_not_save_grid = True
-        adv_proc.do_not_save_samples = True
-        batches = adv_proc.batch_size if allow_batches else 1
-        adv_proc.batch_size = adv_proc.batch_size if allow_batches else 1
-
-        if force_vae:
-            # adv_proc.override_settings["sd_vae_as_default"] = False
-            pass
-
-        total_steps: list[int] = [adv_proc.steps, 0]
-        variation = 1
-        if adv_proc.enable_hr:
-            total_steps[1] = adv_proc.hr_second_pass_steps or adv_proc.steps
-
-        # regroup pairs and filter out "Nothing" axes and empty values
-        axes_settings: list[AxisOption] = []
-        for i in range(0, len(axes_selection), 2):
-            axis_index: int
-            axis_values: str
-            axis_index, axis_values = axes_selection[i : i + 2]
-            if not axis_index or not axis_values:
-                continue
-            axis = deepcopy(axis_options[axis_index])
-            axes_settings.append(axis.set(axis_values))
-
-            index = STEP_FIELDS.index(axis.id) if axis.id in STEP_FIELDS else None
-            if index is not None:
-                total_steps[index] = sum(axis.values)  # type: ignore
-            else:
-                variation *= axis.length
-            axis.validate_all(proc=adv_proc)
-            if not axis.is_valid:
-                logger.warn(f"{axis.label} might contain invalid values")
-
-        if not test_run:
-            shared.total_tqdm.updateTotal(sum(total_steps) * variation)
-
-        with SharedOptionsCache():
-            result = generate_grid(adv_proc, grid_name, overwrite, batches, test_run, axes_settings, for_web)
-
-        for axis in axes_settings:
-            axis.unset()
-
-        logger.info("Done!")
-        return result
+        spec = GridSpec(
+            name=grid_name,
+            axes=[AxisSpec(*axes_selection[i : i + 2]) for i in range(0, len(axes_selection), 2)],
+            overwrite=overwrite,
+            allow_batches=allow_batches,
+            dry_run=test_run,
+            force_vae=force_vae,
+            for_web=for_web,
+            profile_every=PROFILE_EVERY if profile else 0,
+            progressive=progressive,
+        )
+        return GridRun(spec, sd_processing).run()
@@ -1,13 +1,13 @@
 # Python
 from __future__ import annotations
 
+import importlib
 import re
-from dataclasses import dataclass
-from typing import ClassVar
+from decimal import ROUND_HALF_EVEN, Decimal, InvalidOperation
+from fractions import Fraction
 
-# Lib
-import colorama as c
-import numpy as np
+# Local
+from sd_advanced_grid.logs import Logger, logger  # noqa: F401 # pylint: disable=unused-import
 
 # ################################# Constants ################################ #
 
@@ -22,47 +22,12 @@ CRIT_ICON = "\U000026A1"  # ⚡
 # ############################# Utility Functions ############################ #
 
 
-@dataclass(frozen=True)
-class LogLevel:
-    name: str
-    severity: int
-    prefix: str
-    color: str
-
-
-class Logger:
-    DEBUG: ClassVar = LogLevel("debug", 10, "[D]", c.Fore.GREEN)
-    INFO: ClassVar = LogLevel("info", 20, "[I]", c.Fore.BLUE)
-    WARN: ClassVar = LogLevel("warning", 30, "[W]", c.Fore.MAGENTA)
-    ERROR: ClassVar = LogLevel("error", 40, "[E]", c.Fore.RED)
-    CRITICAL: ClassVar = LogLevel("critical", 50, "[C]", c.Fore.YELLOW + c.Style.BRIGHT)
-
-    def __init__(self, level: LogLevel = INFO, *, color: bool = False):
-        self.__min_sev = level.severity
-        c.init(autoreset=False, strip=not color)
-
-    def __print(self, level: LogLevel, msg: str, dataset):
-        if level.severity >= self.__min_sev:
-            print(f"\n{level.color}{level.prefix} {msg}")
-            for sub_msg in dataset:
-                print(f" * {sub_msg}")
-            print(c.Style.RESET_ALL)
-
-    def debug(self, msg: str, dataset: list | None = None):
-        self.__print(Logger.DEBUG, msg, dataset or [])
-
-    def info(self, msg, dataset: list | None = None):
-        self.__print(Logger.INFO, msg, dataset or [])
-
-    def warn(self, msg, dataset: list | None = None):
-        self.__print(Logger.WARN, msg, dataset or [])
-
-    def error(self, msg, dataset: list | None = None):
-        self.__print(Logger.ERROR, msg, dataset or [])
-
-
-# TODO: add cli args to config the logs
-logger = Logger(Logger.DEBUG, color=True)
+def webui_module(name: str):
+    """import a SD-WebUI module lazily, returns None when running outside of the WebUI"""
+    try:
+        return importlib.import_module(f"modules.{name}")
+    except ImportError:
+        return None
 
 
 def clean_name(name: str):
@@ -79,57 +44,80 @@ def get_closest_from_list(name: str, choices: list[str]) -> str:
     return ""
 
 
-re_range = re.compile(r"\s*([+-]?\s*\d+)\s*-\s*([+-]?\s*\d+)(?:\s*\(([+-]\d+)\s*\))?\s*")
-re_range_float = re.compile(
-    r"\s*([+-]?\s*\d+(?:.\d*)?)\s*-\s*([+-]?\s*\d+(?:.\d*)?)(?:\s*\(([+-]\d+(?:.\d*)?)\s*\))?\s*"
-)
-
-re_range_count = re.compile(r"\s*([+-]?\s*\d+)\s*-\s*([+-]?\s*\d+)(?:\s*\[(\d+)\s*\])?\s*")
-re_range_count_float = re.compile(
-    r"\s*([+-]?\s*\d+(?:.\d*)?)\s*-\s*([+-]?\s*\d+(?:.\d*)?)(?:\s*\[(\d+(?:.\d*)?)\s*\])?\s*"
-)
-
-
-def parse_range_int(value_list: list[str]) -> list[int]:
-    parsed_list = []
-
+# ################################## Ranges ################################## #
+# NOTE: ranges are expanded with exact decimal arithmetic, then every number goes through `quantize`,
+#       so the same input always gives the same values, cell ids and file names
+
+DECIMALS = 8  # precision of the float values
+QUANTUM = Decimal(1).scaleb(-DECIMALS)
+
+re_number = r"[+-]?\s*\d+(?:\.\d*)?|[+-]?\s*\.\d+"
+re_range = re.compile(rf"\s*({re_number})\s*-\s*({re_number})\s*(?:\(\s*({re_number})\s*\)|\[\s*(\d+)\s*\])?\s*")
+
+
+def to_decimal(value: str | float | Decimal) -> Decimal:
+    if isinstance(value, float):
+        value = repr(value)  # shortest representation, 0.1 and not 0.1000000000000000055...
+    try:
+        number = Decimal(str(value).replace(" ", ""))
+    except InvalidOperation as exc:
+        raise RuntimeError(f"Not a number: {value}") from exc
+    if not number.is_finite():
+        raise RuntimeError(f"Not a number: {value}")
+    return number
+
+
+def quantize(value: str | float | Decimal | Fraction, integer: bool = False) -> int | float:
+    """canonical value of a number: an int, or a float rounded to DECIMALS places (half to even)"""
+    if isinstance(value, Fraction):
+        value = Decimal(value.numerator) / Decimal(value.denominator)
+    number = to_decimal(value).quantize(Decimal(1) if integer else QUANTUM, rounding=ROUND_HALF_EVEN)
+    return int(number) if integer else float(number) or 0.0  # no -0.0
+
+
+def expand_range(start: Decimal, end: Decimal, step: Decimal | None = None, count: int | None = None) -> list[Fraction]:
+    """
+    values from `start` to `end` (both included) every `step` (1 or -1 by default),
+    or `count` values evenly spaced between them
+    """
+    if count is not None:
+        if count < 2:
+            return [Fraction(start)] * count
+        span = Fraction(end - start)
+        return [Fraction(start) + span * index / (count - 1) for index in range(count)]
+    if step is None:
+        step = Decimal(1) if end >= start else Decimal(-1)
+    if step == 0:
+        raise RuntimeError("The step of a range cannot be 0")
+    # number of steps computed at once, no accumulated error and no overshoot of the end
+    steps = int((Fraction(end - start) / Fraction(step)) // 1)
+    return [Fraction(start + step * index) for index in range(steps + 1)]
+
+
+def parse_range(value_list: list[str], integer: bool = False) -> list[int] | list[float]:
+    """
+    numbers from a list of values and ranges, the same way for int and float axes:
+    `start-end` (every 1), `start-end (step)` and `start-end [count]`, the end is always included,
+    values of a range made equal by the rounding (e.g. `1-2 [3]` on an int axis) are only kept once
+    """
+    parsed_list: list = []
     for val in value_list:
         match = re_range.fullmatch(val)
-        count = re_range_count.fullmatch(val)
-        if match is not None:
-            start = int(match.group(1))
-            end = int(match.group(2)) + 1
-            step = int(match.group(3)) if match.group(3) is not None else 1
-
-            parsed_list += list(range(start, end, step))
-        elif count is not None:
-            start = int(count.group(1))
-            end = int(count.group(2))
-            num = int(count.group(3)) if count.group(3) is not None else 1
-            parsed_list += [int(x) for x in np.linspace(start=start, stop=end, num=num).tolist()]
+        numbers = [to_decimal(group) for group in match.groups()[:3] if group is not None] if match else [to_decimal(val)]
+        if integer and any(number != number.to_integral_value() for number in numbers):
+            raise RuntimeError(f"Must be whole numbers: {val}")
+        if match is None:
+            values: list = numbers
         else:
-            parsed_list.append(int(val))
-
+            count = int(match.group(4)) if match.group(4) is not None else None
+            values = expand_range(numbers[0], numbers[1], numbers[2] if len(numbers) > 2 else None, count)
+        parsed_list += dict.fromkeys(quantize(value, integer) for value in values)
     return parsed_list
 
 
-def parse_range_float(value_list: list[str]) -> list[float]:
-    parsed_list = []
+def parse_range_int(value_list: list[str]) -> list[int]:
+    return parse_range(value_list, integer=True)  # type: ignore
 
-    for val in value_list:
-        match = re_range_float.fullmatch(val)
-        count = re_range_count_float.fullmatch(val)
-        if match is not None:
-            start = float(match.group(1))
-            end = float(match.group(2))
-            step = float(match.group(3)) if match.group(3) is not None else 1
-            parsed_list += np.arange(start, end + step, step).tolist()
-        elif count is not None:
-            start = float(count.group(1))
-            end = float(count.group(2))
-            num = int(count.group(3)) if count.group(3) is not None else 1
-            parsed_list += np.linspace(start=start, stop=end, num=num).tolist()
-        else:
-            parsed_list += [round(float(val), 2)]
 
-    return parsed_list
+def parse_range_float(value_list: list[str]) -> list[float]:
+    return parse_range(value_list)  # type: ignore
@@ -0,0 +1,203 @@
+# Python
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+# Local
+from sd_advanced_grid.journal import TMP_PREFIX, atomic_write, replace_file
+from sd_advanced_grid.results import read_manifest
+from sd_advanced_grid.utils import logger
+
+# ################################### Types ################################## #
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+# ################################# Constants ################################ #
+
+IMAGES_FOLDER = "images"
+THUMBNAILS_FOLDER = "thumbnails"
+WEB_MANIFEST_FILE = "web_manifest.json"
+ANALYSIS_FILE = "analysis.json"  # written by the `analyse` command, embedded in the web manifest
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".avif"}
+FORMATS = {"png": ("PNG", "png"), "webp": ("WEBP", "webp"), "avif": ("AVIF", "avif"), "jpeg": ("JPEG", "jpg")}
+THUMBNAIL_SIZE = 512
+THUMBNAIL_FORMAT = "png"  # same as the thumbnails made while rendering
+
+# ############################# Helper Functions ############################# #
+
+
+@dataclass
+class ThumbnailJob:
+    source: Path
+    target: Path
+    size: int
+    format: str
+    quality: int
+
+
+def check_format(name: str):
+    """make sure Pillow can write the format, AVIF may need the `pillow-avif-plugin` package"""
+    # pylint: disable=import-outside-toplevel
+    from PIL import Image
+
+    if name not in FORMATS:
+        raise RuntimeError(f"Unknown thumbnail format: {name}")
+    pil_format = FORMATS[name][0]
+    Image.init()
+    if pil_format == "AVIF" and pil_format not in Image.SAVE:
+        try:
+            import pillow_avif  # noqa: F401 # pylint: disable=unused-import
+        except ImportError as exc:
+            raise RuntimeError("AVIF thumbnails require Pillow 11.3+ or the pillow-avif-plugin package") from exc
+    if pil_format not in Image.SAVE:
+        raise RuntimeError(f"Pillow cannot write {name} files on this system")
+
+
+def make_thumbnail(job: ThumbnailJob) -> tuple[int, int]:
+    """resize an image with a reduced decode where the format allows it (e.g. JPEG draft mode)"""
+    # pylint: disable=import-outside-toplevel
+    from PIL import Image
+
+    pil_format = FORMATS[job.format][0]
+    if pil_format == "AVIF":
+        check_format(job.format)  # registers the plugin in the worker process
+    with Image.open(job.source) as image:
+        image.draft("RGB", (job.size, job.size))
+        image.thumbnail((job.size, job.size), reducing_gap=3.0)
+        if pil_format == "JPEG" and image.mode not in {"RGB", "L"}:
+            image = image.convert("RGB")
+        tmp_path = job.target.with_name(f"{TMP_PREFIX}{job.target.name}")
+        image.save(tmp_path, format=pil_format, quality=job.quality)
+        replace_file(tmp_path, job.target)
+        return image.size
+
+
+def thumbnail_size(path: Path) -> tuple[int, int]:
+    # pylint: disable=import-outside-toplevel
+    from PIL import Image
+
+    with Image.open(path) as image:  # only reads the header
+        return image.size
+
+
+def list_images(grid_path: Path) -> list[Path]:
+    folder = grid_path.joinpath(IMAGES_FOLDER)
+    return sorted(
+        path
+        for path in folder.glob("adv_cell-*.*")
+        if path.suffix.lower() in IMAGE_EXTENSIONS and not path.name.startswith(TMP_PREFIX)
+    )
+
+
+def thumbnail_path(grid_path: Path, image: Path, format_name: str = THUMBNAIL_FORMAT) -> Path:
+    return grid_path.joinpath(THUMBNAILS_FOLDER, f"{image.stem}.{FORMATS[format_name][1]}")
+
+
+def is_up_to_date(image: Path, thumbnail: Path) -> bool:
+    try:
+        return thumbnail.stat().st_mtime >= image.stat().st_mtime
+    except FileNotFoundError:
+        return False
+
+
+# ################################# Backfill ################################# #
+
+
+def backfill_thumbnails(
+    grid_path: Path,
+    size: int = THUMBNAIL_SIZE,
+    format_name: str = THUMBNAIL_FORMAT,
+    quality: int = 85,
+    workers: int | None = None,
+    force: bool = False,
+) -> dict[str, Any]:
+    """create the missing or outdated thumbnails of a grid, then write its web manifest"""
+    check_format(format_name)
+    if not grid_path.joinpath(IMAGES_FOLDER).is_dir():
+        raise RuntimeError(f"No grid found in {grid_path}")
+    grid_path.joinpath(THUMBNAILS_FOLDER).mkdir(exist_ok=True)
+
+    jobs: list[ThumbnailJob] = []
+    thumbnails: dict[str, dict[str, Any]] = {}
+    for image in list_images(grid_path):
+        target = thumbnail_path(grid_path, image, format_name)
+        thumbnails[image.name] = {"thumbnail": target.relative_to(grid_path).as_posix()}
+        if force or not is_up_to_date(image, target):
+            jobs.append(ThumbnailJob(image, target, size, format_name, quality))
+
+    failed = 0
+    if jobs:
+        logger.info(f"Creating {len(jobs)} thumbnails out of {len(thumbnails)} images")
+        workers = min(workers or os.cpu_count() or 1, len(jobs))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [(job, executor.submit(make_thumbnail, job)) for job in jobs]
+            for job, future in futures:
+                try:
+                    width, height = future.result()
+                except Exception as exc:  # pylint: disable=broad-exception-caught
+                    logger.error(f"Thumbnail of {job.source.name} failed: {exc}")
+                    thumbnails.pop(job.source.name)
+                    failed += 1
+                else:
+                    thumbnails[job.source.name].update(width=width, height=height)
+
+    write_web_manifest(grid_path, thumbnails)
+    return {"images": len(thumbnails) + failed, "created": len(jobs) - failed, "failed": failed}
+
+
+# ############################### Web Manifest ############################### #
+
+
+def cell_of(image_name: str) -> str:
+    """cell id from an image name (`adv_cell-<id>-...`)"""
+    return image_name.split("-", maxsplit=2)[1]
+
+
+def write_web_manifest(grid_path: Path, thumbnails: dict[str, dict[str, Any]] | None = None):
+    """
+    describe a grid for a web viewer: its axes, and for each cell its values, images and thumbnails,
+    cells missing from the results manifest (e.g. grids rendered by older versions) only list their files
+    """
+    if thumbnails is None:
+        thumbnails = {}
+        for image in list_images(grid_path):
+            for format_name in FORMATS:
+                target = thumbnail_path(grid_path, image, format_name)
+                if target.exists():
+                    thumbnails[image.name] = {"thumbnail": target.relative_to(grid_path).as_posix()}
+                    break
+    config_path = grid_path.joinpath("config.json")
+    config = json.loads(config_path.read_text(encoding="UTF-8")) if config_path.exists() else {}
+    results = read_manifest(grid_path)
+
+    cells: dict[str, dict[str, Any]] = {}
+    for image_name in sorted(thumbnails):
+        cell_id = cell_of(image_name)
+        if cell_id not in cells:
+            cells[cell_id] = {"id": cell_id, "axes": results.get(cell_id, {}).get("axes"), "images": []}
+        thumbnail = thumbnails[image_name]
+        if "width" not in thumbnail:
+            thumbnail.update(zip(("width", "height"), thumbnail_size(grid_path.joinpath(thumbnail["thumbnail"]))))
+        cells[cell_id]["images"].append({"image": f"{IMAGES_FOLDER}/{image_name}", **thumbnail})
+
+    manifest = {"name": config.get("name"), "axes": config.get("axis", []), "cells": list(cells.values())}
+    analysis_path = grid_path.joinpath(ANALYSIS_FILE)
+    if analysis_path.exists():
+        manifest["analysis"] = json.loads(analysis_path.read_text(encoding="UTF-8"))
+    atomic_write(grid_path.joinpath(WEB_MANIFEST_FILE), json.dumps(manifest, indent=2))
+    return manifest
+
+
+def backfill_all(grid_paths: Iterable[Path], **options) -> int:
+    failed = 0
+    for grid_path in grid_paths:
+        summary = backfill_thumbnails(grid_path, **options)
+        logger.info(f"{grid_path.name}: {summary['created']} thumbnails created, {summary['failed']} failed")
+        failed += summary["failed"]
+    return failed
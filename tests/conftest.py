@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# stand-in SD-WebUI `modules` package, for the tests of the modules relying on the WebUI
+sys.path.append(str(Path(__file__).resolve().parents[1].joinpath("benchmarks", "stubs")))
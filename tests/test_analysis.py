@@ -0,0 +1,41 @@
+import numpy as np
+
+from sd_advanced_grid.analysis import SAMPLE_SIZE, duplicate_clusters, flat_cells, luma_maps, pair_distances
+
+
+def test_structure_distance_of_flat_images():
+    rng = np.random.default_rng(0)
+    pixels = np.stack(
+        [
+            np.full((SAMPLE_SIZE, SAMPLE_SIZE, 3), 128, dtype=np.uint8),
+            np.full((SAMPLE_SIZE, SAMPLE_SIZE, 3), 128, dtype=np.uint8),
+            np.full((SAMPLE_SIZE, SAMPLE_SIZE, 3), 37, dtype=np.uint8),
+            rng.integers(0, 256, (SAMPLE_SIZE, SAMPLE_SIZE, 3), dtype=np.uint8),
+        ]
+    )
+    maps = luma_maps(pixels)
+    pixel, structure = pair_distances(pixels, maps, np.array([0, 0, 0, 3]), np.array([1, 2, 3, 3]))
+    # identical or uniform images share their structure, a uniform image has none in common with a noisy one
+    assert np.allclose(structure, [0.0, 0.0, 0.5, 0.0], atol=1e-6)
+    assert pixel[0] == 0.0 and pixel[1] > 0.0
+
+
+def test_flat_images_are_not_duplicates():
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 256, (SAMPLE_SIZE, SAMPLE_SIZE, 3), dtype=np.uint8)
+    pixels = np.stack(
+        [
+            np.full((SAMPLE_SIZE, SAMPLE_SIZE, 3), 0, dtype=np.uint8),
+            np.full((SAMPLE_SIZE, SAMPLE_SIZE, 3), 255, dtype=np.uint8),
+            np.full((SAMPLE_SIZE, SAMPLE_SIZE, 3), 37, dtype=np.uint8),
+            noise,
+            noise,
+            rng.integers(0, 256, (SAMPLE_SIZE, SAMPLE_SIZE, 3), dtype=np.uint8),
+        ]
+    )
+    cell_ids = ["0101", "0201", "0301", "0102", "0202", "0302"]
+    maps = luma_maps(pixels)
+    # uniform images share an all zeros luminance map, they are reported apart instead of as one cluster
+    assert duplicate_clusters(cell_ids, maps) == [["0102", "0202"]]
+    assert flat_cells(cell_ids, maps) == ["0101", "0201", "0301"]
+    assert duplicate_clusters(cell_ids[:3], maps[:3]) == []
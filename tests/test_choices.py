@@ -0,0 +1,30 @@
+from modules import sd_models
+
+from sd_advanced_grid.choices import ChoiceList, HandleCache
+
+
+def test_lists_follow_the_webui_refreshes(monkeypatch):
+    monkeypatch.setattr(sd_models, "checkpoints_list", {"alpha.safetensors": 1, "beta.safetensors": 2})
+    builds = []
+
+    def build(checkpoints):
+        builds.append(1)
+        return sorted(checkpoints)
+
+    choices = ChoiceList("sd_models", lambda module: (module.checkpoints_list,), build)
+    handles = HandleCache("sd_models", lambda module: (module.checkpoints_list,), lambda module, value: value.upper())
+    for _ in range(100):
+        assert choices.closest("beta") == "beta.safetensors"
+    assert len(builds) == 1
+    assert handles.resolve_all(["beta"]) == {"beta": "BETA"}
+
+    # renamed in place, only noticed through the refresh
+    sd_models.checkpoints_list.pop("beta.safetensors")
+    sd_models.checkpoints_list["gamma.safetensors"] = 3
+    sd_models.list_models()
+    assert choices.closest("gamma") == "gamma.safetensors"
+    assert choices() == ["alpha.safetensors", "gamma.safetensors"]
+    assert len(builds) == 2
+    # and added items are noticed from the size
+    sd_models.checkpoints_list["delta.safetensors"] = 4
+    assert choices.closest("delta") == "delta.safetensors"
@@ -0,0 +1,38 @@
+import pytest
+
+from sd_advanced_grid.cli import main
+from sd_advanced_grid.grid_spec import GridSpec
+
+
+@pytest.mark.parametrize(
+    "name, content",
+    [
+        ("list.json", '[{"axis": "Steps", "values": "10"}]'),
+        ("broken.json", '{"name": "grid",'),
+        ("broken.yaml", "name: [grid"),
+        ("params.json", '{"params": ["prompt"]}'),
+        ("axes.json", '{"axes": "Steps"}'),
+        ("axis.json", '{"axes": [{"axis": "Steps", "value": "10"}]}'),
+        ("option.json", '{"size": 3}'),
+    ],
+)
+def test_invalid_grid_files(tmp_path, capsys, name, content):
+    path = tmp_path.joinpath(name)
+    path.write_text(content, encoding="UTF-8")
+    with pytest.raises(RuntimeError):
+        GridSpec.from_file(path)
+    assert main(["plan", str(path)]) == 2
+    assert capsys.readouterr().err.startswith("Error: ")
+
+
+def test_missing_grid_file(tmp_path, capsys):
+    assert main(["plan", str(tmp_path.joinpath("missing.json"))]) == 2
+    assert "Cannot read grid file" in capsys.readouterr().err
+
+
+def test_grid_file(tmp_path):
+    path = tmp_path.joinpath("grid.yaml")
+    path.write_text("name: grid\naxes:\n  Steps: 10-20 (+5)\nparams:\n  prompt: cat\n", encoding="UTF-8")
+    spec = GridSpec.from_file(path)
+    assert spec.selection() == [("Steps", "10-20 (+5)")]
+    assert spec.params == {"prompt": "cat"}
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import math
+import string
+from copy import deepcopy
+
+import pytest
+
+from sd_advanced_grid.axis_options import axis_options, find_axis_index
+from sd_advanced_grid.grid_plan import GridIdentity, convert, iter_cell_ids, iter_cell_indexes
+
+CHAR_SET = string.digits + string.ascii_uppercase
+
+
+def legacy_convert(num: int):
+    base = len(CHAR_SET)
+    converted = ""
+    while num:
+        digit = num % base
+        converted += CHAR_SET[digit]
+        num //= base
+    return converted[::-1].zfill(2)
+
+
+def legacy_cells(axes):
+    """cell ids and hashed filenames as `apply_axes` and `generate_filename` computed them before `GridIdentity`"""
+    ordered = sorted(axes, key=lambda axis: axis.cost)
+    for _ in range(math.prod(axis.length for axis in axes)):
+        axis_set = {}
+        axis_code = ["00"] * len(axes)
+        should_iter = True
+        for axis in ordered:
+            axis_code[axes.index(axis)] = legacy_convert(axis.index + 1)
+            axis_set[axis.id] = (axis.label, axis.value)
+            if should_iter:
+                should_iter = not axis.next()
+        encoded = json.dumps(axis_set, sort_keys=True, indent=2).encode("utf-8")
+        yield "".join(axis_code[::-1]), hashlib.md5(encoded).hexdigest()
+
+
+def make_axes(selection):
+    return [deepcopy(axis_options[find_axis_index(key)]).set(values) for key, values in selection]
+
+
+@pytest.mark.parametrize(
+    "selection",
+    [
+        [("Steps", "1-40"), ("CFG Scale", "1.5, 7, 0.1"), ("Tiling", "True, False"), ("Seed", "1, -1")],
+        [("Replace TAG", 'TAG=café, "quoted", back\\slash, 🐱 naïve'), ("ETA", "0-1 [3]"), ("Steps", "5, 10")],
+        [("Var Strength", "0.25, 1e-3"), ("Replace TAG", "TAG=a, b"), ("CFG Scale", "3"), ("Var Seed", "7-9")],
+        [("Seed", "1"), ("Seed", "2, 3")],  # same id, the last applied wins
+    ],
+)
+def test_identity_matches_the_legacy_scheme(selection):
+    axes = make_axes(selection)
+    legacy = list(legacy_cells(axes))
+    identity = GridIdentity(axes)
+    cells = [(identity.cell_id(indexes), identity.digest(indexes)) for indexes in iter_cell_indexes(axes)]
+    assert cells == legacy
+    assert list(iter_cell_ids(axes)) == [cell_id for cell_id, _ in legacy]
+
+
+def test_convert_matches_the_legacy_codes():
+    assert all(convert(num) == legacy_convert(num) for num in range(1, 5000))
@@ -0,0 +1,32 @@
+from sd_advanced_grid.journal import JOURNAL_FILE, PLANNED, RunJournal
+
+
+def test_new_grid_is_resumed_from_the_journal(tmp_path):
+    images = tmp_path.joinpath("images")
+    journal = RunJournal(tmp_path, images)
+    journal.plan(["aa", "ab"])
+    journal.record("ab", "started")
+    assert journal.complete
+    # files left by a crash before the journal recorded them are not trusted
+    images.mkdir()
+    images.joinpath("adv_cell-aa-0123.png").touch()
+    resumed = RunJournal(tmp_path, images)
+    assert resumed.complete and resumed.cells["aa"].state == PLANNED
+    assert resumed.is_done("aa", images) is False
+    assert resumed.is_done("ab", images) is False
+    assert resumed.is_done("zz", images) is False
+
+
+def test_older_grid_relies_on_its_files(tmp_path):
+    images = tmp_path.joinpath("images")
+    images.mkdir()
+    images.joinpath("adv_cell-aa-0123.png").touch()
+    journal = RunJournal(tmp_path, images)
+    journal.plan(["aa"])
+    assert not journal.complete
+    assert journal.is_done("aa", images) is None
+    # a journal written before the header existed is an older grid too
+    legacy = tmp_path.joinpath("legacy")
+    legacy.mkdir()
+    legacy.joinpath(JOURNAL_FILE).write_text('{"cell": "aa", "state": "planned", "time": 0}\n', encoding="UTF-8")
+    assert RunJournal(legacy, legacy.joinpath("images")).is_done("aa", images) is None
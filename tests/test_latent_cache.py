@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+import numpy as np
+from modules import processing
+
+from sd_advanced_grid.latent_cache import ENCODER, InitLatentCache
+
+
+class FakeTensor:
+    """the few tensor methods used by the cache, on a numpy array"""
+
+    def __init__(self, array):
+        self.array = np.asarray(array, dtype=np.float32)
+        self.shape, self.dtype = self.array.shape, self.array.dtype
+
+    def detach(self):
+        return self
+
+    def float(self):
+        return self
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+    def clone(self):
+        return FakeTensor(self.array.copy())
+
+
+def test_encodes_are_keyed_on_their_pixels(monkeypatch):
+    encoded = []
+
+    def encode(image, *_):
+        encoded.append(image)
+        return FakeTensor(image.array * 2)
+
+    monkeypatch.setattr(processing, ENCODER, encode, raising=False)
+    cache = InitLatentCache()
+    proc = SimpleNamespace(init_images=["image"])
+    init, conditioning = FakeTensor(np.ones((1, 3, 4, 4))), FakeTensor(np.full((1, 3, 4, 4), 0.5))
+    for _ in range(3):  # cells of a denoising sweep
+        with cache.patch(proc):
+            assert (processing.images_tensor_to_samples(init).array == 2).all()
+            # e.g. inpainting conditioning, depends on the mask weight of the cell
+            assert (processing.images_tensor_to_samples(conditioning).array == 1).all()
+    assert len(encoded) == 2 and (cache.hits, cache.misses) == (4, 2)
+    assert getattr(processing, ENCODER) is encode
@@ -0,0 +1,17 @@
+from modules import processing, shared
+
+from sd_advanced_grid.batching import BatchSizer
+from sd_advanced_grid.output import generate_filename
+
+
+def test_user_filenames_of_split_batches(monkeypatch):
+    monkeypatch.setattr(shared.opts, "samples_filename_pattern", "[seed]-[prompt_spaces]")
+    proc = processing.StableDiffusionProcessingTxt2Img(prompt="cat", seed=100, batch_size=4)
+    sizer = BatchSizer(4)
+    sizer.apply(proc)
+    sizer.failure(proc)  # out of memory, 2 batches of 2
+    assert (proc.batch_size, proc.n_iter) == (2, 2)
+    processing.process_images(proc)
+    assert proc.seeds == [102, 103]  # last batch only
+    names = [generate_filename(proc, {}, idx, keep_origin=True) for idx in range(4)]
+    assert names == ["100-cat", "101-cat", "102-cat", "103-cat"]
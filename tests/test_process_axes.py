@@ -0,0 +1,40 @@
+import json
+import socket
+import tracemalloc
+
+import pytest
+from modules import shared
+from modules.processing import StableDiffusionProcessingTxt2Img
+
+from sd_advanced_grid.grid_cell import GridCell
+from sd_advanced_grid.grid_plan import build_axes, grid_folder
+from sd_advanced_grid.grid_spec import GridSpec
+from sd_advanced_grid.process_axes import generate_grid
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_failed_run_releases_its_services(tmp_path, monkeypatch):
+    def broken_save(*_):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(GridCell, "save", broken_save)
+    monkeypatch.setattr(shared.state, "interrupted", False, raising=False)
+    proc = StableDiffusionProcessingTxt2Img(prompt="cat", outpath_grids=str(tmp_path), seed=1, subseed=2)
+    axes = build_axes([("Steps", "1-3")], proc=proc)
+    metrics_port, status_port = free_port(), free_port()
+    spec = GridSpec(metrics_port=metrics_port, status_port=status_port, profile_every=1)
+
+    with pytest.raises(OSError):
+        generate_grid(proc, "broken", False, 1, False, axes, spec=spec)
+
+    assert not tracemalloc.is_tracing()
+    for port in (metrics_port, status_port):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", port))  # released
+    status = json.loads(grid_folder(tmp_path, "broken").joinpath("status.json").read_text(encoding="UTF-8"))
+    assert status["state"] == "failed"
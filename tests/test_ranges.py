@@ -0,0 +1,68 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+from sd_advanced_grid.utils import parse_range_float, parse_range_int
+
+SAMPLES = 500
+
+
+def random_number(rng: random.Random, integer: bool) -> str:
+    if integer:
+        return str(rng.randint(-100, 100))
+    return str(Decimal(rng.randint(-2_000, 2_000)).scaleb(-rng.randint(1, 3)))
+
+
+def random_range(rng: random.Random, integer: bool) -> tuple[str, Decimal, Decimal]:
+    """a range in one of the supported syntaxes, with its bounds"""
+    start, end = random_number(rng, integer), random_number(rng, integer)
+    low, high = sorted((Decimal(start), Decimal(end)))
+    syntax = rng.choice(["plain", "step", "count"])
+    if syntax == "step":
+        step = Decimal(rng.randint(1, 20)) if integer else Decimal(rng.randint(10, 500)).scaleb(-2)
+        step = step if Decimal(end) >= Decimal(start) else -step
+        return f"{start}-{end} ({step:+})", low, high
+    if syntax == "count":
+        return f"{start}-{end} [{rng.randint(0, 30)}]", low, high
+    return f"{start}-{end}", low, high
+
+
+@pytest.mark.parametrize("parse, integer", [(parse_range_int, True), (parse_range_float, False)])
+def test_ranges_are_stable(parse, integer):
+    rng = random.Random(0)
+    for _ in range(SAMPLES):
+        value, low, high = random_range(rng, integer)
+        values = parse([value])
+        # parsing again gives the same values
+        assert parse([value]) == values
+        # values are a fixed point of their printed form
+        assert parse([str(number) for number in values]) == values
+        # the bounds are never exceeded
+        assert all(low <= Decimal(str(number)) <= high for number in values), value
+        # rounding never duplicates a value
+        assert len(set(values)) == len(values), value
+        assert all(type(number) is (int if integer else float) for number in values)
+
+
+def test_float_ranges_are_exact():
+    assert parse_range_float(["0-1 (+0.1)"]) == [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+    assert parse_range_float(["0.1-0.3 (0.1)"]) == [0.1, 0.2, 0.3]
+    assert parse_range_float(["1-2 [4]"]) == [1.0, 1.33333333, 1.66666667, 2.0]
+    assert parse_range_float(["0.125", "-0.0"]) == [0.125, 0.0]
+
+
+def test_int_and_float_share_the_syntax():
+    for value in ["1-5", "10-1", "1-10 (+3)", "10-1 (-3)", "0-10 [6]", "5", "-3--1"]:
+        assert parse_range_float([value]) == [float(number) for number in parse_range_int([value])], value
+
+
+def test_int_count_ranges_drop_duplicates():
+    assert parse_range_int(["1-2 [3]"]) == [1, 2]
+    assert parse_range_int(["0-10 [4]"]) == [0, 3, 7, 10]
+
+
+@pytest.mark.parametrize("value", ["1.5-3", "2.5", "1-3 (0)", "abc"])
+def test_invalid_int_ranges(value):
+    with pytest.raises(RuntimeError):
+        parse_range_int([value])
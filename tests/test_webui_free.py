@@ -0,0 +1,37 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# modules used by the CLI, the status endpoint and the grid tools, which run without SD-WebUI
+WEBUI_FREE = [
+    "sd_advanced_grid.analysis",
+    "sd_advanced_grid.cli",
+    "sd_advanced_grid.grid_plan",
+    "sd_advanced_grid.pipeline",
+    "sd_advanced_grid.progress",
+    "sd_advanced_grid.web_assets",
+]
+
+ROOT = Path(__file__).resolve().parents[1]
+BLOCKER = """
+import importlib, sys
+
+class Blocker:
+    def find_spec(self, name, *_):
+        if name.split(".")[0] in {"modules", "gradio"}:
+            raise ImportError(f"{name} imported outside of the WebUI")
+
+sys.meta_path.insert(0, Blocker())
+importlib.import_module(sys.argv[1])
+"""
+
+
+@pytest.mark.parametrize("module", WEBUI_FREE)
+def test_imports_without_webui(module):
+    # a fresh interpreter, the other tests may have imported the stand-in `modules` package
+    result = subprocess.run(
+        [sys.executable, "-c", BLOCKER, module], cwd=ROOT, capture_output=True, text=True, check=False
+    )
+    assert result.returncode == 0, result.stderr